@@ -0,0 +1,116 @@
+"""bench_import times and memory profiles CsvXmlImporter end to end and per stage
+
+run from the repository root:
+    python benchmarks/bench_import.py [--rows 1000,100000] [--files 1,8] [--output results.json]
+
+data is generated with generate.py into --directory and reused on later runs
+every case is timed --repeat times and the fastest run is reported, the per stage figures are the ImportStats
+of that run, peak memory is measured in a separate run with tracemalloc as tracing slows everything down,
+results are written as json to --output, by default into --directory, to compare runs"""
+import argparse
+import json
+import platform
+import sys
+import tempfile
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+from time import perf_counter
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from csvxmlimporter import CsvXmlImporter, ImportStats  # noqa: E402
+from generate import variants, generate_csv_set, generate_xml_set  # noqa: E402
+
+
+def measure(function, repeat):
+    """measure returns the fastest wall time of repeat calls, the stage summary of that call
+        and the peak memory of one traced call"""
+    seconds, summary = float("inf"), None
+    for _ in range(repeat):
+        stats = ImportStats()
+        start = perf_counter()
+        function(stats)
+        elapsed = perf_counter() - start
+        if elapsed < seconds:
+            seconds, summary = elapsed, stats.summary()
+
+    tracemalloc.start()
+    try:
+        function(ImportStats())
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return seconds, summary, peak
+
+
+def end_to_end(files, xslfile=None, **options):
+    """end_to_end returns a function importing the files with a new importer reporting to the given observer
+        every run starts with the empty xml caches of its new importer"""
+
+    def run(observer):
+        importer = CsvXmlImporter(observer=observer, **options)
+        if xslfile:
+            importer.set_xslfile(xslfile)
+        importer.update_files(*files)
+        return importer.dfx
+
+    return run
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--directory", default=str(Path(tempfile.gettempdir()) / "csvxmlimporter-bench"))
+    parser.add_argument("--rows", default="1000,100000", help="comma separated rows per file")
+    parser.add_argument("--files", default="1,8", help="comma separated file counts")
+    parser.add_argument("--variants", default=",".join([*variants, "xml"]), help="comma separated variants")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=0, help="also run end to end with a process pool")
+    parser.add_argument("--output", help="json file of the results, default bench_results.json in --directory")
+    args = parser.parse_args()
+
+    Path(args.directory).mkdir(parents=True, exist_ok=True)
+    args.output = args.output or str(Path(args.directory) / "bench_results.json")
+    results = []
+
+    def record(variant, rows, count, run, function):
+        seconds, summary, peak = measure(function, args.repeat)
+        results.append(dict(variant=variant, rows=rows, files=count, stage=run, seconds=seconds, peak_bytes=peak))
+        print(f"{variant:>18} {rows:>8} rows {count:>4} files {run:>16} {seconds:>9.4f} s {peak / 2 ** 20:>9.1f} MiB")
+        # the stages are timed per file, with workers they overlap and may add up to more than the wall time
+        for stage, row in summary.iterrows():
+            results.append(dict(variant=variant, rows=rows, files=count, stage=f"{run}/{stage}",
+                                seconds=float(row["seconds"]), peak_bytes=None))
+            print(f"{variant:>18} {rows:>8} rows {count:>4} files {stage:>16} {row['seconds']:>9.4f} s")
+
+    for variant in args.variants.split(","):
+        for rows in map(int, args.rows.split(",")):
+            for count in map(int, args.files.split(",")):
+                if variant == "xml":
+                    files, xslfile = generate_xml_set(args.directory, rows, count)
+                else:
+                    files, xslfile = generate_csv_set(args.directory, variant, rows, count), None
+
+                record(variant, rows, count, "end_to_end", end_to_end(files, xslfile))
+                if args.workers:
+                    record(variant, rows, count, f"end_to_end_w{args.workers}",
+                           end_to_end(files, xslfile, workers=args.workers))
+
+    output = dict(
+        meta=dict(
+            created=datetime.now(timezone.utc).isoformat(),
+            python=platform.python_version(),
+            pandas=pd.__version__,
+            platform=platform.platform(),
+            arguments=vars(args),
+        ),
+        results=results,
+    )
+    Path(args.output).write_text(json.dumps(output, indent=2))
+    print(f"results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
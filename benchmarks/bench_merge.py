@@ -0,0 +1,70 @@
+"""bench_merge times merging per-file dataframes into one for a growing number of files
+
+run from the repository root:
+    python benchmarks/bench_merge.py [--rows 100] [--append-limit 1000]
+
+merge_frames should scale linearly with the number of files, the old append loop (emulated with one
+pd.concat per file as DataFrame.append is gone in newer pandas) is measured up to --append-limit files
+to show its quadratic growth"""
+import argparse
+import sys
+from pathlib import Path
+from time import perf_counter
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from csvxmlimporter import merge_frames  # noqa: E402
+
+
+def make_frames(count, rows):
+    """make_frames creates count small frames, every tenth frame has an additional column"""
+    rng = np.random.default_rng(0)
+    frames = []
+    for i in range(count):
+        frame = pd.DataFrame({
+            "id": np.arange(rows),
+            "value": rng.random(rows),
+            "name": ["name"] * rows,
+        })
+        if i % 10 == 0:
+            frame["extra"] = rng.integers(0, 100, rows)
+        frames.append(frame)
+    return frames
+
+
+def append_loop(frames):
+    """append_loop merges frames like update_files used to, one copy of the accumulated frame per file"""
+    dfx = pd.DataFrame()
+    for frame in frames:
+        dfx = pd.concat([dfx, frame])
+    return dfx
+
+
+def timeit(function, *args):
+    start = perf_counter()
+    function(*args)
+    return perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100, help="rows per file")
+    parser.add_argument("--append-limit", type=int, default=1000, help="largest file count for the append loop")
+    args = parser.parse_args()
+
+    print(f"{'files':>6} {'merge s':>10} {'merge us/file':>14} {'append s':>10} {'append us/file':>15}")
+    for count in (10, 100, 1000, 10000):
+        frames = make_frames(count, args.rows)
+        sources = [f"file{i}.csv" for i in range(count)]
+        merge = timeit(merge_frames, frames, sources, "source")
+        line = f"{count:>6} {merge:>10.4f} {merge / count * 1e6:>14.1f}"
+        if count <= args.append_limit:
+            append = timeit(append_loop, frames)
+            line += f" {append:>10.4f} {append / count * 1e6:>15.1f}"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
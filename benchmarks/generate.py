@@ -0,0 +1,125 @@
+"""generate writes synthetic csv and xml files with a matching xsl stylesheet for the benchmarks
+
+run from the repository root:
+    python benchmarks/generate.py DIRECTORY [--rows 10000] [--files 4]
+
+every file is generated from a fixed seed so runs on different machines read the same data"""
+import argparse
+import csv
+import random
+from pathlib import Path
+from xml.sax.saxutils import escape
+
+# columns of the generated records and a function creating a value of each from a random generator
+columns = {
+    "id": lambda rng, i: str(i),
+    "name": lambda rng, i: rng.choice(["Müller", "Schäfer", "Weiß", "Smith", "Østergård", "Jürgen"]),
+    "email": lambda rng, i: f"user{i}@example.com",
+    "price": lambda rng, i: f"{rng.randint(0, 99999) / 100:.2f}".replace(".", ","),
+    "active": lambda rng, i: rng.choice(["ja", "nein", "WAHR", "FALSCH"]),
+    "date": lambda rng, i: f"{rng.randint(1, 28):02d}.{rng.randint(1, 12):02d}.{rng.randint(1990, 2030)}",
+    "time": lambda rng, i: f"{rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}:{rng.randint(0, 59):02d}",
+    "comment": lambda rng, i: rng.choice(["", "ok", "needs review", "said \"hello\"", "a;b,c"]),
+}
+
+# csv variants written by generate_csv_set, name: (delimiter, quoting, encoding, header)
+variants = {
+    "comma-utf8": (",", csv.QUOTE_MINIMAL, "utf-8", True),
+    "semicolon-cp1252": (";", csv.QUOTE_MINIMAL, "windows-1252", True),
+    "tab-utf16": ("\t", csv.QUOTE_MINIMAL, "utf-16", True),
+    "pipe-quoteall": ("|", csv.QUOTE_ALL, "utf-8", True),
+    "comma-noheader": (",", csv.QUOTE_MINIMAL, "utf-8", False),
+}
+
+xsl = """<?xml version="1.0" encoding="UTF-8"?>
+<xsl:stylesheet version="1.0" xmlns:xsl="http://www.w3.org/1999/XSL/Transform">
+    <xsl:output method="text" encoding="UTF-8"/>
+    <xsl:param name="delimiter" select="';'"/>
+    <xsl:template match="/">
+        <xsl:text>{header}&#10;</xsl:text>
+        <xsl:for-each select="records/record">
+{fields}
+            <xsl:text>&#10;</xsl:text>
+        </xsl:for-each>
+    </xsl:template>
+</xsl:stylesheet>
+"""
+
+
+def records(rows, seed=0):
+    """records yields rows lists of values for the columns"""
+    rng = random.Random(seed)
+    for i in range(rows):
+        yield [create(rng, i) for create in columns.values()]
+
+
+def write_csv(path, rows, delimiter=",", quoting=csv.QUOTE_MINIMAL, encoding="utf-8", header=True, seed=0):
+    """write_csv writes a csv file with the given dialect and encoding"""
+    with open(path, "w", newline="", encoding=encoding) as f:
+        writer = csv.writer(f, delimiter=delimiter, quoting=quoting)
+        if header:
+            writer.writerow(columns)
+        writer.writerows(records(rows, seed))
+
+
+def write_xml(path, rows, seed=0):
+    """write_xml writes a flat xml file with one record element per row"""
+    with open(path, "w", encoding="utf-8") as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n<records>\n')
+        for values in records(rows, seed):
+            fields = "".join(f"<{column}>{escape(value)}</{column}>" for column, value in zip(columns, values))
+            f.write(f"<record>{fields}</record>\n")
+        f.write("</records>\n")
+
+
+def write_xsl(path):
+    """write_xsl writes a stylesheet converting the files of write_xml to csv text"""
+    fields = "\n".join(
+        ("" if i == 0 else '            <xsl:value-of select="$delimiter"/>\n')
+        + f'            <xsl:value-of select="translate({column}, $delimiter, \' \')"/>'
+        for i, column in enumerate(columns)
+    )
+    Path(path).write_text(xsl.format(header=";".join(columns), fields=fields), encoding="utf-8")
+
+
+def generate_csv_set(directory, variant, rows, files):
+    """generate_csv_set writes files csv files of a variant and returns their paths"""
+    delimiter, quoting, encoding, header = variants[variant]
+    paths = []
+    for i in range(files):
+        path = Path(directory) / f"{variant}-{rows}-{i}.csv"
+        if not path.exists():
+            write_csv(path, rows, delimiter, quoting, encoding, header, seed=i)
+        paths.append(str(path))
+    return paths
+
+
+def generate_xml_set(directory, rows, files):
+    """generate_xml_set writes files xml files and the xsl file and returns their paths"""
+    xslpath = Path(directory) / "records.xsl"
+    if not xslpath.exists():
+        write_xsl(xslpath)
+    paths = []
+    for i in range(files):
+        path = Path(directory) / f"records-{rows}-{i}.xml"
+        if not path.exists():
+            write_xml(path, rows, seed=i)
+        paths.append(str(path))
+    return paths, str(xslpath)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("directory")
+    parser.add_argument("--rows", type=int, default=10000, help="rows per file")
+    parser.add_argument("--files", type=int, default=4, help="files per variant")
+    args = parser.parse_args()
+
+    Path(args.directory).mkdir(parents=True, exist_ok=True)
+    for variant in variants:
+        generate_csv_set(args.directory, variant, args.rows, args.files)
+    generate_xml_set(args.directory, args.rows, args.files)
+
+
+if __name__ == "__main__":
+    main()
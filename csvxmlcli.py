@@ -0,0 +1,135 @@
+"""csvxmlcli merges csv and xml files into one csv, parquet or feather file without a gui
+
+examples:
+    python csvxmlcli.py "data/*.csv" -o merged.parquet --workers 4
+    python csvxmlcli.py data/*.xml --xsl convert.xsl --param "delimiter=';'" -o merged.csv
+    python csvxmlcli.py logs/*.csv --delimiter ";" --columns id,name --where "id > 100" > selected.csv
+
+pandas, lxml and chardet are only imported once files are read, so --help returns right away"""
+import argparse
+import glob
+import os
+import sys
+
+from csvxmlimporter import CsvXmlImporter, ImportStats, XslFileMissing, exportformats, export_frame
+
+
+def pair(text):
+    """pair splits a NAME=VALUE argument"""
+    name, separator, value = text.partition("=")
+    if not separator:
+        raise argparse.ArgumentTypeError(f"expected NAME=VALUE, got {text}")
+    return name, value
+
+
+def expand(patterns):
+    """expand returns the files matching the patterns in order, patterns without wildcards are kept as they are"""
+    filenames = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern)) if glob.has_magic(pattern) else [pattern]
+        filenames += [filename for filename in matches if filename not in filenames]
+    return filenames
+
+
+def create_parser():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("files", nargs="+", help="csv and xml files or glob patterns")
+    parser.add_argument("-o", "--output", default="-", help="output file, csv to stdout if - (default)")
+    parser.add_argument("--format", choices=sorted(set(exportformats.values())),
+                        help="output format, taken from the extension of the output file by default")
+    parser.add_argument("--compression", help="compression of parquet or feather output like snappy, zstd or lz4")
+    parser.add_argument("--output-delimiter", default=",", help="delimiter of csv output")
+    parser.add_argument("--output-encoding", default="utf-8", help="encoding of csv output")
+
+    group = parser.add_argument_group("dialect of the input, guessed from the first file if not given")
+    group.add_argument("--delimiter")
+    group.add_argument("--quotechar")
+    group.add_argument("--escapechar")
+    group.add_argument("--encoding", help="encoding of all files instead of detecting it per file")
+    group.add_argument("--skipinitialspace", action="store_true", default=None)
+    group.add_argument("--engine", choices=["c", "python", "pyarrow"], help="pandas.read_csv parser engine")
+
+    group = parser.add_argument_group("xml")
+    group.add_argument("--xsl", help="xsl file converting the xml files to csv")
+    group.add_argument("--param", type=pair, action="append", default=[], metavar="NAME=VALUE",
+                       help="xsl parameter, may be repeated")
+    group.add_argument("--records", help="stream the records with this tag or path instead of using an xsl file")
+    group.add_argument("--field", type=pair, action="append", default=[], metavar="COLUMN=PATH",
+                       help="field of a record read with --records, may be repeated")
+
+    group = parser.add_argument_group("import")
+    group.add_argument("--columns", help="comma separated columns to import")
+    group.add_argument("--where", help="pandas query selecting the rows to import like \"age > 30\"")
+    group.add_argument("--key", help="comma separated key columns, later files replace the rows of their keys")
+    group.add_argument("--provenance", help="name of a column holding the file each row was read from")
+    group.add_argument("--infer-types", action="store_true", help="convert the columns to the detected types")
+    group.add_argument("--compact", action="store_true", help="store the columns in the smallest dtypes")
+    group.add_argument("--workers", type=int, default=os.cpu_count(), help="processes reading files in parallel")
+    group.add_argument("--cache", help="directory keeping parsed files in between runs")
+    group.add_argument("--stats", action="store_true", help="print the time every stage took to stderr")
+    return parser
+
+
+def main(argv=None):
+    args = create_parser().parse_args(argv)
+    filenames = expand(args.files)
+    if not filenames:
+        print("error: no files match", file=sys.stderr)
+        return 1
+
+    settings = {
+        key: value for key, value in (
+            ("delimiter", args.delimiter),
+            ("quotechar", args.quotechar),
+            ("escapechar", args.escapechar),
+            ("encoding", args.encoding),
+            ("skipinitialspace", args.skipinitialspace),
+            ("engine", args.engine),
+        ) if value is not None
+    }
+    stats = ImportStats() if args.stats else None
+    importer = CsvXmlImporter(
+        provenance=args.provenance,
+        workers=args.workers if len(filenames) > 1 else None,
+        cache=args.cache,
+        infertypes=args.infer_types,
+        compact=args.compact,
+        key=args.key.split(",") if args.key else None,
+        observer=stats,
+        **settings
+    )
+
+    try:
+        with importer.batch():
+            if args.xsl:
+                importer.set_xslfile(args.xsl)
+                importer.set_xslparameter(**{**importer.get_xslparameter(default=True), **dict(args.param)})
+            if args.records:
+                importer.set_xmlrecords(args.records, dict(args.field))
+            if args.columns or args.where:
+                importer.select(args.columns.split(",") if args.columns else None, args.where)
+            importer.update_files(*filenames)
+
+        if args.output == "-":
+            importer.dfx.to_csv(sys.stdout, sep=args.output_delimiter, index=False)
+        else:
+            format = args.format or exportformats.get(os.path.splitext(args.output)[1].lower())
+            if format == "csv":
+                export_frame(importer.dfx, args.output, format, sep=args.output_delimiter,
+                             encoding=args.output_encoding, index=False)
+            else:
+                export_frame(importer.dfx, args.output, format, compression=args.compression)
+    except (XslFileMissing, ValueError, OSError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+    except Exception as e:
+        print(f"error: {type(e).__name__}: {e}", file=sys.stderr)
+        return 1
+
+    if stats is not None:
+        print(stats.summary().to_string(), file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,12 +1,44 @@
+from __future__ import annotations
+
+import codecs
 import csv
+import glob
+import hashlib
+import importlib
+import itertools
+import os
+import pickle
 import re
+import weakref
+from collections import OrderedDict
+from concurrent.futures import Executor, ProcessPoolExecutor, wait, FIRST_COMPLETED
+from contextlib import contextmanager
 from io import StringIO
 from pathlib import Path
-from typing import Optional, Dict, List
+from time import perf_counter, sleep
+from typing import Optional, Dict, List, Callable
+
+
+class _LazyModule:
+    """_LazyModule stands in for a module until its first attribute is used and then imports it
+        and replaces itself in the globals of this module so importing csvxmlimporter stays fast
+        for command line tools that may never touch pandas"""
+
+    def __init__(self, name, alias):
+        self.__name = name
+        self.__alias = alias
+
+    def __getattr__(self, attribute):
+        module = importlib.import_module(self.__name)
+        globals()[self.__alias] = module
+        return getattr(module, attribute)
 
-import pandas as pd
-from chardet import detect
-from lxml import etree
+
+# heavy dependencies are imported on first use
+np = _LazyModule("numpy", "np")
+pd = _LazyModule("pandas", "pd")
+chardet = _LazyModule("chardet", "chardet")
+etree = _LazyModule("lxml.etree", "etree")
 
 # regular expressions for typchecking strings
 types = {
@@ -37,31 +69,1156 @@ types = {
     ),
 }
 
+# byte order marks and the encodings they indicate
+# utf-32 has to be checked before utf-16 as the utf-32-le bom starts with the utf-16-le bom
+boms = (
+    (codecs.BOM_UTF32_LE, "utf-32"),
+    (codecs.BOM_UTF32_BE, "utf-32"),
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+)
+
+
+def detect_encoding(filename, samplesize=1 << 16, samplecount=0, confidence=0.9):
+    """detect_encoding guesses the encoding of a file from a bounded sample of its content
+        the first samplesize bytes are read plus samplecount strided samples of the same size from the rest of the file
+        a byte order mark or samples that are pure ascii/ valid utf-8 are returned right away
+        otherwise the samples utf-8 can't decode are fed to chardet until its guess reaches the given confidence
+        a sample can miss the bytes telling the encoding, _load_file then detects it from the whole file"""
+    size = os.path.getsize(filename)
+    with open(filename, "rb") as f:
+        samples = [f.read(samplesize)]
+
+        for bom, encoding in boms:
+            if samples[0].startswith(bom):
+                return encoding
+
+        if samplecount and size > samplesize:
+            stride = (size - samplesize) // samplecount
+            for i in range(samplecount):
+                f.seek(samplesize + i * stride)
+                sample = f.read(min(samplesize, stride))
+                # skip utf-8 continuation bytes of a character cut off by the seek
+                start = 0
+                while start < min(3, len(sample)) and sample[start] & 0xC0 == 0x80:
+                    start += 1
+                samples.append(sample[start:])
+
+    complete = size <= samplesize
+    if all(sample.isascii() for sample in samples):
+        return "ascii" if complete else "utf-8"
+    undecodable = []
+    for sample in samples:
+        try:
+            # incremental decoder tolerates a character cut off at the end of a sample
+            codecs.getincrementaldecoder("utf-8")().decode(sample, final=complete)
+        except UnicodeDecodeError:
+            undecodable.append(sample)
+    if not undecodable:
+        return "utf-8"
+
+    # only the samples utf-8 can't decode tell the encoding apart, ascii text would make chardet guess ascii
+    # so each of them is fed from the line holding its first non ascii byte on
+    detector = chardet.UniversalDetector()
+    for sample in undecodable:
+        start = re.search(rb"[\x80-\xff]", sample).start()
+        sample = sample[sample.rfind(b"\n", 0, start) + 1:]
+        for i in range(0, len(sample), 4096):
+            detector.feed(sample[i:i + 4096])
+            # the samples are not pure ascii, so an ascii guess only means the bytes telling the encoding
+            # are still ahead
+            guess = detector.result
+            if detector.done or (guess["encoding"] not in (None, "ascii") and guess["confidence"] >= confidence):
+                break
+        else:
+            continue
+        break
+    detector.close()
+    # latin-1 decodes any byte sequence and serves as fallback if chardet has no guess
+    return detector.result["encoding"] or "ISO-8859-1"
+
+
+def _numpy_dtype(dtype):
+    """_numpy_dtype returns the numpy dtype behind a numpy or nullable number or boolean dtype else None"""
+    numpy = dtype if isinstance(dtype, np.dtype) else getattr(dtype, "numpy_dtype", None)
+    if isinstance(numpy, np.dtype) and numpy.kind in "iufb" and getattr(dtype, "kind", None) in tuple("iufb"):
+        return numpy
+    return None
+
+
+def _nullable(dtype):
+    """_nullable returns the nullable pandas dtype of a numpy number or boolean dtype"""
+    if dtype.kind == "b":
+        return pd.BooleanDtype()
+    return pd.api.types.pandas_dtype(dtype.name.replace("uint", "UInt").replace("int", "Int").replace("float", "Float"))
+
+
+def common_dtype(dtypes, missing=False):
+    """common_dtype returns a dtype that can hold the values of all given dtypes without loss
+        numbers get the smallest common type, nullable if any of them is nullable, categoricals the union of
+        their categories, if missing is set the dtype has to hold missing values as well"""
+    dtypes = [*dtypes]
+    numpy = [_numpy_dtype(dtype) for dtype in dtypes]
+    if all(dtype == dtypes[0] for dtype in dtypes):
+        dtype = dtypes[0]
+    elif all(isinstance(dtype, pd.CategoricalDtype) for dtype in dtypes):
+        categories = dtypes[0].categories
+        for other in dtypes[1:]:
+            categories = categories.append(other.categories[~other.categories.isin(categories)])
+        return pd.CategoricalDtype(categories)
+    elif all(dtype is not None for dtype in numpy) and len({dtype.kind == "b" for dtype in numpy}) == 1:
+        dtype = np.result_type(*numpy)
+        if not all(isinstance(other, np.dtype) for other in dtypes):
+            return _nullable(dtype)
+    else:
+        return np.dtype(object)
+
+    if missing and isinstance(dtype, np.dtype):
+        if dtype.kind in "iu":
+            return np.dtype("float64")
+        if dtype.kind == "b":
+            return np.dtype(object)
+    return dtype
+
+
+def merge_frames(frames, sources=None, provenance=None):
+    """merge_frames concatenates the given dataframes once into one with a fresh index
+        the union of all columns and their common dtypes are computed up front so no column gets
+        converted more than once, if provenance is set a categorical column with that name holds the
+        source of each row taken from sources"""
+    frames = [*frames]
+    if not frames:
+        return pd.DataFrame()
+
+    # union of all columns in order of appearance and the dtypes each column has in the frames
+    # frames without rows neither shape the dtypes nor leave values missing, their other columns come last
+    filled = [frame for frame in frames if len(frame)] or frames
+    dtypes, empty = {}, {}
+    for frame in filled:
+        for column, dtype in frame.dtypes.items():
+            dtypes.setdefault(column, []).append(dtype)
+    for frame in frames:
+        for column, dtype in frame.dtypes.items():
+            if column not in dtypes:
+                empty.setdefault(column, []).append(dtype)
+    schema = {column: common_dtype(d, missing=len(d) < len(filled)) for column, d in dtypes.items()}
+    schema.update((column, common_dtype(d, missing=True)) for column, d in empty.items())
+    columns = pd.Index(schema.keys())
+
+    aligned = []
+    for frame in filled:
+        if not frame.columns.equals(columns):
+            frame = frame.reindex(columns=columns)
+        changed = {column: schema[column] for column, dtype in zip(columns, frame.dtypes) if schema[column] != dtype}
+        aligned.append(frame.astype(changed) if changed else frame)
+
+    dfx = pd.concat(aligned, ignore_index=True) if len(aligned) > 1 else aligned[0].reset_index(drop=True)
+
+    if provenance:
+        categories = {source: i for i, source in enumerate(dict.fromkeys(sources))}
+        codes = np.repeat([categories[source] for source in sources], [len(frame) for frame in frames])
+        dfx[provenance] = pd.Categorical.from_codes(codes, categories=[*categories])
+
+    return dfx
+
+
+def _key_values(frame, key):
+    """_key_values returns the values of the key columns of every row, tuples if there is more than one column
+        missing values all become None so rows lacking a key value share one key like in groupby with dropna=False"""
+    values = []
+    for column in key:
+        series = frame[column]
+        if series.hasnans:
+            series = series.astype(object).where(series.notna(), None)
+        values.append(series.tolist())
+    return values[0] if len(key) == 1 else [*zip(*values)]
+
+
+class LruCache:
+    """LruCache is a dict like cache holding at most maxsize entries and optionally at most maxbytes bytes
+        the least recently used entries are dropped, an entry larger than maxbytes isn't kept at all"""
+
+    def __init__(self, maxsize=32, maxbytes=None):
+        self.maxsize = maxsize
+        self.maxbytes = maxbytes
+        self.nbytes = 0
+        self.__entries = OrderedDict()
+
+    def get(self, key, default=None):
+        """get returns the entry for key and marks it as recently used"""
+        if key not in self.__entries:
+            return default
+        self.__entries.move_to_end(key)
+        return self.__entries[key][0]
+
+    def put(self, key, value, nbytes=0):
+        """put adds an entry of nbytes bytes and drops the least recently used ones if there are too many"""
+        if key in self.__entries:
+            self.nbytes -= self.__entries.pop(key)[1]
+        if self.maxbytes is not None and nbytes > self.maxbytes:
+            return
+        self.__entries[key] = value, nbytes
+        self.__entries.move_to_end(key)
+        self.nbytes += nbytes
+        while self.__entries and (len(self.__entries) > max(self.maxsize, 0)
+                                  or self.maxbytes is not None and self.nbytes > self.maxbytes):
+            self.nbytes -= self.__entries.popitem(last=False)[1][1]
+
+    def clear(self):
+        self.__entries.clear()
+        self.nbytes = 0
+
+    def __len__(self):
+        return len(self.__entries)
+
+
+class _Stopwatch:
+    """_Stopwatch collects how long the stages of one file take, disabled it does nothing"""
+
+    def __init__(self, enabled):
+        self.events = [] if enabled else None
+        self.__last = perf_counter() if enabled else None
+
+    def lap(self, stage, nbytes=None, rows=None):
+        """lap records the time since the previous lap as the given stage"""
+        if self.events is not None:
+            now = perf_counter()
+            self.events.append((stage, now - self.__last, nbytes, rows))
+            self.__last = now
+
+
+class ImportStats:
+    """ImportStats is an observer for CsvXmlImporter collecting wall time, bytes and rows per stage and file
+        stages are detect, sniff, read_csv, xmlparse, transform, xmlrecords, infer, compact, guess and merge
+        and cache_hit, xmlcache_hit or reused for files that did not have to be parsed
+        pass any callable with the same signature as observer to export the events elsewhere"""
+
+    def __init__(self):
+        self.events = []
+
+    def __call__(self, stage, filename, seconds, nbytes=None, rows=None):
+        self.events.append(dict(stage=stage, filename=filename, seconds=seconds, bytes=nbytes, rows=rows))
+
+    def summary(self):
+        """summary returns count, seconds, bytes and rows per stage as dataframe"""
+        if not self.events:
+            return pd.DataFrame(columns=["count", "seconds", "bytes", "rows"])
+        frame = pd.DataFrame(self.events)
+        return frame.groupby("stage", sort=False).agg(
+            count=("stage", "size"), seconds=("seconds", "sum"), bytes=("bytes", "sum"), rows=("rows", "sum")
+        )
+
+    def clear(self):
+        self.events = []
+
+
+# compiled xsl transformers of this process by xsl file and its modification time
+_transformers = {}
+# per importer lru caches of parsed xml trees by file version and of the csv text of their transformation
+# by file version, xsl file and parameters, the caches of an importer are dropped together with the importer
+_xmlcaches = {}
+_xmlcacheids = itertools.count()
+
+
+def _get_transformer(xslfile):
+    """_get_transformer returns the compiled transformer and the parsed tree of a .xsl file
+        transformers are compiled once per process and file version"""
+    stat = os.stat(xslfile)
+    key = (os.path.abspath(xslfile), stat.st_mtime_ns, stat.st_size)
+    if key not in _transformers:
+        tree = etree.parse(xslfile)
+        _transformers[key] = etree.XSLT(tree), tree
+    return _transformers[key]
+
+
+def _xml_caches(cacheid, treesize, textsize, maxbytes):
+    """_xml_caches returns the tree and text lru caches of one importer in this process
+        they are created with the sizes of that importer on first use, also in worker processes"""
+    caches = _xmlcaches.get(cacheid)
+    if caches is None:
+        caches = _xmlcaches[cacheid] = LruCache(treesize, maxbytes), LruCache(textsize, maxbytes)
+    return caches
+
+
+def _read_xml(filename, xslfile, xslparameter, caches=None, watch=None):
+    """_read_xml opens a given xml file and return its content as csv text
+        caches is an optional pair of lru caches for parsed trees and transformation results see _xml_caches
+        so only a change of the file, the xsl file or its parameters causes a new transformation
+        trees are weighed by the size of their xml file and results by their length
+        watch is an optional _Stopwatch to time the stages"""
+    watch = watch or _Stopwatch(False)
+    trees, texts = caches or (LruCache(0), LruCache(0))
+    version = _file_version(filename)
+    xslversion = _file_version(xslfile)
+    key = (version, xslversion, tuple(sorted(xslparameter.items())))
+
+    text = texts.get(key)
+    if text is None:
+        tree = trees.get(version)
+        if tree is None:
+            tree = etree.parse(filename)
+            trees.put(version, tree, version[1])
+            watch.lap("xmlparse", version[1])
+        transformer, _ = _get_transformer(xslfile)
+        text = str(transformer(tree, **xslparameter))
+        texts.put(key, text, len(text))
+        watch.lap("transform", len(text))
+    else:
+        watch.lap("xmlcache_hit", len(text))
+    return text
+
+
+def _check_type(string):
+    """check whether given input string matches any of the predetermined types
+        returns matching type or 'String'"""
+    for key in types:
+        if types[key].match(string):
+            return key
+    return "String"
+
+
+def _ascertain_header(file, settings):
+    """_ascertain_header returns an dic with information about the header of a given csv file"""
+    header = {}
+
+    with StringIO(file) as f:
+        sample = f.readline() + f.readline()
+
+        if csv.Sniffer().has_header(sample):
+            header.update(
+                header=0
+            )
+        else:
+            f.seek(0)
+            firstline = next(
+                csv.reader(
+                    f,
+                    delimiter=settings["delimiter"],
+                    doublequote=settings["doublequote"],
+                    escapechar=settings["escapechar"],
+                    quotechar=settings["quotechar"],
+                    quoting=settings["quoting"],
+                    skipinitialspace=settings["skipinitialspace"],
+                )
+            )
+            headernames = []
+            for i, item in enumerate(firstline):
+                headernames.append(f'{i}_{_check_type(item)}')
+            header.update(
+                header=None,
+                names=headernames
+            )
+
+    return header
+
+
+def _iter_xml_records(filename, record, fields, batchsize=10000):
+    """_iter_xml_records streams the records of a flat xml file as dataframes of at most batchsize rows
+        record is the tag or a simple path like items/item or /root/items/item of the record elements
+        fields maps column names to xpath expressions relative to a record element
+        processed elements are cleared so memory stays flat regardless of the document size"""
+    steps = record.strip("/").split("/")
+    ancestors = steps[-2::-1]
+    absolute = record.startswith("/")
+    xpaths = {column: _field_getter(path) for column, path in dict(fields).items()}
+
+    def named(element, step):
+        """check whether element has the name of step, steps without namespace match the local name in any namespace"""
+        return (element.tag if step[0] == "{" else element.tag.rpartition("}")[2]) == step
+
+    def matches(element):
+        """check whether the ancestors of element match the given absolute record path"""
+        parent = element.getparent()
+        for step in ancestors:
+            if parent is None or not named(parent, step):
+                return False
+            parent = parent.getparent()
+        return parent is None or not absolute
+
+    def nested(element):
+        """check whether element sits inside a record, such elements are part of that record"""
+        parent = element.getparent()
+        while parent is not None:
+            if named(parent, steps[-1]) and matches(parent):
+                return True
+            parent = parent.getparent()
+        return False
+
+    tag = steps[-1] if steps[-1].startswith("{") else f"{{*}}{steps[-1]}"
+    columns = {column: [] for column in xpaths}
+    rows = 0
+    yielded = False
+    for _, element in etree.iterparse(filename, events=("end",), tag=tag):
+        # elements of the same name inside a record are still needed by its fields and cleared with the record
+        # records of an absolute path all sit at the same depth so they can't be inside another one
+        if not matches(element) or not absolute and nested(element):
+            if not nested(element):
+                element.clear()
+            continue
+        for column, xpath in xpaths.items():
+            columns[column].append(xpath(element) or None)
+        rows += 1
+        element.clear()
+        while element.getprevious() is not None:
+            del element.getparent()[0]
+
+        if rows >= batchsize:
+            yield _records_frame(columns)
+            yielded = True
+            columns = {column: [] for column in xpaths}
+            rows = 0
+
+    if rows or not yielded:
+        yield _records_frame(columns)
+
+
+def _field_getter(path):
+    """_field_getter returns a function reading the value at path relative to an element
+        plain attributes and child paths are read directly, everything else is evaluated as xpath"""
+    if re.fullmatch(r"@[\w.-]+", path):
+        return lambda element: element.get(path[1:])
+    if re.fullmatch(r"[\w.-]+(/[\w.-]+)*", path):
+        # match children in any namespace like the record tag does
+        path = "/".join(f"{{*}}{step}" for step in path.split("/"))
+        return lambda element: element.findtext(path)
+    xpath = etree.XPath(f"string({path})")
+    return lambda element: xpath(element)
+
+
+def _records_frame(columns):
+    """_records_frame builds a dataframe from lists of strings converting numeric columns"""
+    frame = pd.DataFrame(columns)
+    for column in frame.columns:
+        try:
+            frame[column] = pd.to_numeric(frame[column])
+        except (ValueError, TypeError):
+            pass
+    return frame
+
+
+def _read_xml_records(filename, record, fields, batchsize=10000):
+    """_read_xml_records reads all records of a flat xml file into one dataframe see _iter_xml_records"""
+    return merge_frames(_iter_xml_records(filename, record, fields, batchsize))
+
+
+def _is_text(column):
+    """check whether a column holds strings in an object or string dtype"""
+    return column.dtype == object or isinstance(column.dtype, pd.StringDtype) or column.dtype == "str"
+
+
+def infer_types(frame, sample=None, categorythreshold=0.5, true_values=None, false_values=None):
+    """infer_types converts the text columns of a dataframe to the types matched by the types patterns
+        each column is classified as a whole with vectorized string matching, or only sample rows of it
+        Int and Float (comma decimals included) become numbers, Bool booleans, Date datetimes and Time timedeltas
+        a conversion is only kept if it does not lose values the sample didn't cover
+        the remaining text columns with at most categorythreshold unique values per row become categoricals"""
+    true_values = {value.lower() for value in true_values or ("wahr", "true", "ja")}
+    false_values = {value.lower() for value in false_values or ("falsch", "false", "nein")}
+    frame = frame.copy()
+
+    for name in frame.columns:
+        column = frame[name]
+        if not _is_text(column):
+            continue
+        values = column.dropna()
+        if values.empty:
+            continue
+        checked = values if not sample or len(values) <= sample else values.sample(sample, random_state=0)
+        # object dtype keeps matching with python re, arrow backed strings don't support all of the types patterns
+        checked = checked.astype(str).str.strip().astype(object)
+
+        # rule out most types on a few values before matching all of them
+        head = checked.iloc[:100]
+        candidates = [key for key, pattern in types.items() if head.str.match(pattern).all()]
+        kind = next((key for key in candidates if checked.str.match(types[key]).all()), "String")
+        # whole numbers mixed with decimals make a float column
+        if kind == "String":
+            numeric = head.str.match(types["Int"]) | head.str.match(types["Float"])
+            if numeric.all() and (checked.str.match(types["Int"]) | checked.str.match(types["Float"])).all():
+                kind = "Float"
+
+        if kind != "String":
+            strings = column.astype(str).str.strip().where(column.notna())
+
+        if kind == "Int":
+            converted = pd.to_numeric(strings, errors="coerce")
+            if converted.isna().any():
+                converted = converted.astype("Int64")
+        elif kind == "Float":
+            converted = pd.to_numeric(strings.str.replace(",", ".", regex=False), errors="coerce")
+        elif kind == "Bool":
+            lowered = strings.str.lower()
+            converted = pd.Series(pd.NA, index=column.index, dtype="boolean")
+            converted[lowered.isin(true_values)] = True
+            converted[lowered.isin(false_values)] = False
+            if not converted.isna().any():
+                converted = converted.astype(bool)
+        elif kind == "Date":
+            converted = pd.to_datetime(strings, dayfirst=True, errors="coerce")
+        elif kind == "Time":
+            converted = pd.to_timedelta(strings, errors="coerce")
+        else:
+            converted = None
+
+        # keep the conversion only if every value could be converted
+        if converted is not None and converted.isna().sum() == column.isna().sum():
+            frame[name] = converted
+        elif values.nunique() <= categorythreshold * len(values):
+            frame[name] = column.astype("category")
+
+    return frame
+
+
+def _satisfies(dtype, kind):
+    """_satisfies checks whether values of a dtype are of the given kind of the types patterns without matching them"""
+    api = pd.api.types
+    if api.is_bool_dtype(dtype):
+        return kind == "Bool"
+    return (kind == "Int" and api.is_integer_dtype(dtype)
+            or kind == "Float" and api.is_numeric_dtype(dtype)
+            or kind == "Date" and api.is_datetime64_any_dtype(dtype)
+            or kind == "Time" and api.is_timedelta64_dtype(dtype))
+
+
+def _check_values(values, kind, allowmissing=True):
+    """_check_values returns a boolean array that is True for every value not of the given kind
+        kind is the name of one of the types patterns or a regular expression a value has to match completely"""
+    missing = values.isna().to_numpy()
+    if kind in types and _satisfies(values.dtype, kind):
+        bad = np.zeros(len(values), dtype=bool)
+    elif kind == "Int" and pd.api.types.is_float_dtype(values.dtype):
+        # whole numbers are read as float if the column has missing values
+        bad = (values % 1 != 0).to_numpy()
+    else:
+        # object dtype keeps matching with python re, arrow backed strings don't support all of the types patterns
+        text = values.astype(str).str.strip().astype(object)
+        bad = ~text.str.fullmatch(types.get(kind, kind)).to_numpy(dtype=bool, na_value=False)
+    bad = bad & ~missing
+    return bad | missing if not allowmissing else bad
+
+
+def validate_frame(frame, schema, chunksize=100000, allowmissing=True, executor=None):
+    """validate_frame checks every value of the columns in schema against the type schema maps the column to
+        a type is the name of one of the types patterns like "Email" or "Int" or a regular expression
+        columns already converted to a matching dtype pass without looking at the values
+        the columns are checked in chunks of chunksize rows with vectorized matching, with an executor the chunks
+        of all columns are checked in parallel, missing values are violations only if allowmissing is False
+        returns the number of violations per column and a boolean dataframe that is True for every violation,
+        mask.any(axis=1) selects the invalid rows"""
+    absent = [column for column in schema if column not in frame.columns]
+    if absent:
+        raise ValueError(f'Columns {", ".join(map(str, absent))} are not in the data')
+
+    tasks = {}
+    for column, kind in schema.items():
+        for start in range(0, len(frame), chunksize):
+            chunk = frame[column].iloc[start:start + chunksize]
+            if executor is None:
+                tasks[column, start] = _check_values(chunk, kind, allowmissing)
+            else:
+                tasks[column, start] = executor.submit(_check_values, chunk, kind, allowmissing)
+
+    mask = {}
+    for column in schema:
+        chunks = [tasks[column, start] for start in range(0, len(frame), chunksize)]
+        if executor is not None:
+            chunks = [future.result() for future in chunks]
+        mask[column] = np.concatenate(chunks) if chunks else np.zeros(0, dtype=bool)
+    mask = pd.DataFrame(mask, index=frame.index, columns=[*schema])
+    return mask.sum().rename("violations"), mask
+
+
+# read_csv options the pyarrow engine does not support and their defaults, they are dropped if set to the default
+_pyarrowunsupported = {
+    "quoting": csv.QUOTE_MINIMAL, "skipinitialspace": False, "lineterminator": None, "memory_map": False
+}
+
+
+def _engine_settings(settings, path=False):
+    """_engine_settings adapts read_csv settings to the selected parser engine
+        csv files read from a path are memory mapped by the default c engine"""
+    engine = settings.get("engine")
+    if engine == "pyarrow":
+        return {
+            key: value for key, value in settings.items()
+            if key not in _pyarrowunsupported or value != _pyarrowunsupported[key]
+        }
+    if path and engine in (None, "c"):
+        return {"memory_map": True, **settings}
+    return settings
+
+
+def _query_names(where):
+    """_query_names returns the names a pandas.DataFrame.query string may refer to
+        names inside string literals are left out, backquoted names are kept with their spaces"""
+    quoted = re.findall(r"`([^`]*)`", where)
+    where = re.sub(r"`[^`]*`|'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"", " ", where)
+    return [*dict.fromkeys(quoted + re.findall(r"(?<![@\w.])[^\W\d]\w*", where))]
+
+
+def _select(frame, select):
+    """_select keeps the rows of a frame matching the where of select and then the selected columns in their order
+        where is a pandas.DataFrame.query string or a function returning a boolean mask for a frame"""
+    if select is None:
+        return frame
+    columns, where, _ = select
+    if where is not None:
+        frame = frame.query(where) if isinstance(where, str) else frame[where(frame)]
+    if columns is not None:
+        frame = frame[[column for column in columns if column in frame.columns]]
+    return frame
+
+
+def _read_selected(source, settings, header, select, chunksize=100000):
+    """_read_selected parses csv text with pandas.read_csv keeping only the rows and columns of select
+        the selected columns and the columns where needs are pushed into read_csv as usecols and rows are filtered
+        chunk by chunk before they are cut to the selected columns, so data that is not selected is never held in
+        memory as a whole, the pyarrow engine can do neither and is filtered afterwards"""
+    if select is None:
+        return pd.read_csv(source, **settings, **header)
+    _, where, parsed = select
+    pyarrow = settings.get("engine") == "pyarrow"
+    if parsed is not None and not pyarrow:
+        # a function instead of a list so files lacking some of the columns can be read
+        wanted = set(parsed)
+        settings = {**settings, "usecols": lambda column: column in wanted}
+    if where is None or pyarrow:
+        return _select(pd.read_csv(source, **settings, **header), select)
+    with pd.read_csv(source, chunksize=chunksize, **settings, **header) as reader:
+        chunks = [_select(chunk, select) for chunk in reader]
+    return pd.concat(chunks, ignore_index=True)
+
+
+def _read_head(filename, encoding):
+    """_read_head returns the first two lines of a given csv file as text without reading the whole file"""
+    with open(filename, encoding=encoding) as f:
+        return f.readline() + f.readline()
+
+
+def _smallest_int(minimum, maximum):
+    """_smallest_int returns the smallest signed integer dtype holding the given range"""
+    for dtype in (np.int8, np.int16, np.int32, np.int64):
+        if np.iinfo(dtype).min <= minimum and maximum <= np.iinfo(dtype).max:
+            return np.dtype(dtype)
+    return np.dtype(np.int64)
+
+
+def compact_frame(frame, categorythreshold=0.5):
+    """compact_frame returns the dataframe with every column stored in the smallest dtype holding its values
+        integers are downcast, floats holding only whole numbers become nullable integers and other floats
+        float32 if that keeps every value, text columns with at most categorythreshold unique values per row
+        become categoricals and object columns of booleans the nullable boolean dtype"""
+    frame = frame.copy()
+    for name in frame.columns:
+        column = frame[name]
+        numpy = _numpy_dtype(column.dtype)
+        values = column.dropna()
+
+        if numpy is not None and numpy.kind in "iu" and len(values):
+            dtype = _smallest_int(values.min(), values.max())
+            frame[name] = column.astype(dtype if isinstance(column.dtype, np.dtype) else _nullable(dtype))
+        elif numpy is not None and numpy.kind == "f" and len(values):
+            if (values % 1 == 0).all() and np.iinfo(np.int64).min <= values.min() <= values.max() < 2 ** 63:
+                frame[name] = column.astype(_nullable(_smallest_int(values.min(), values.max())))
+            elif isinstance(column.dtype, np.dtype) and numpy.itemsize > 4:
+                smaller = column.astype(np.float32)
+                if np.array_equal(smaller.to_numpy(np.float64), column.to_numpy(np.float64), equal_nan=True):
+                    frame[name] = smaller
+        elif _is_text(column) and len(values):
+            if column.dtype == object and values.map(type).eq(bool).all():
+                frame[name] = column.astype("boolean")
+            elif values.nunique() <= categorythreshold * len(values):
+                frame[name] = column.astype("category")
+    return frame
+
+
+def _load_file(filename, options):
+    """_load_file reads and parses one file, it holds all per file work so it can run in a worker process
+        options holds the pandas.read_csv settings, the encoding detection settings, the xsl file and parameters,
+        the xml cache sizes, the xml record settings, the selected columns and rows, the type inference and the
+        compaction settings of the importer
+        the memory each column took before compaction is kept in frame.attrs["uncompacted"]
+        if options timed is set the stages are timed
+        returns the dataframe, the encoding the file was read with and the timed stages or None"""
+    settings = options["settings"]
+    watch = _Stopwatch(options["timed"])
+    select = options["select"]
+    if filename.endswith(".xml") and options["xmlrecords"]:
+        encoding = None
+        record, fields, batchsize = options["xmlrecords"]
+        if select is not None and select[2] is not None:
+            fields = [(column, path) for column, path in fields if column in select[2]]
+        frame = merge_frames(_select(batch, select) for batch in _iter_xml_records(filename, record, fields, batchsize))
+        watch.lap("xmlrecords", os.path.getsize(filename), len(frame))
+    elif filename.endswith(".csv"):
+        # only the head is read as text, pandas parses the file straight from disk
+        encoding = settings.get("encoding") or detect_encoding(filename, **options["detectsettings"])
+        watch.lap("detect")
+        try:
+            frame = _read_csv_file(filename, settings, encoding, select, watch)
+        except UnicodeDecodeError:
+            if settings.get("encoding"):
+                raise
+            # the samples missed the bytes telling the encoding, so it is detected from the whole file
+            detectsettings = {**options["detectsettings"], "samplesize": max(os.path.getsize(filename), 1),
+                              "samplecount": 0}
+            encoding = detect_encoding(filename, **detectsettings)
+            watch.lap("detect")
+            frame = _read_csv_file(filename, settings, encoding, select, watch)
+        watch.lap("read_csv", os.path.getsize(filename), len(frame))
+    else:
+        encoding = None
+        file = _read_xml(filename, options["xslfile"], options["xslparameter"],
+                         _xml_caches(*options["xmlcache"]), watch)
+        header = _ascertain_header(file, settings)
+        watch.lap("sniff")
+        frame = _read_selected(StringIO(file), _engine_settings(settings), header, select)
+        watch.lap("read_csv", len(file), len(frame))
+
+    return _convert_frame(frame, options, watch), encoding, watch.events
+
+
+def _read_csv_file(filename, settings, encoding, select, watch):
+    """_read_csv_file parses a csv file from disk with the given encoding keeping the selection of select"""
+    header = _ascertain_header(_read_head(filename, encoding), settings)
+    watch.lap("sniff")
+    return _read_selected(filename, _engine_settings({**settings, "encoding": encoding}, path=True), header, select)
+
+
+def _convert_frame(frame, options, watch=None):
+    """_convert_frame infers the types and compacts a parsed frame as set in options see _load_file"""
+    watch = watch or _Stopwatch(False)
+    settings = options["settings"]
+    if options["compact"] is not None:
+        uncompacted = frame.memory_usage(deep=True, index=False).to_dict()
+
+    if options["infertypes"] is not None:
+        frame = infer_types(
+            frame,
+            **options["infertypes"],
+            true_values=settings.get("true_values"),
+            false_values=settings.get("false_values"),
+        )
+        watch.lap("infer", rows=len(frame))
+
+    if options["compact"] is not None:
+        frame = compact_frame(frame, **options["compact"])
+        frame.attrs["uncompacted"] = uncompacted
+        watch.lap("compact", rows=len(frame))
+    return frame
+
+
+def _file_version(filename):
+    """_file_version returns path, size and modification time of a file which change with every write"""
+    stat = os.stat(filename)
+    return os.path.abspath(filename), stat.st_size, stat.st_mtime_ns
+
+
+class ParseCache:
+    """ParseCache stores parsed per file results on disk so unchanged files don't have to be parsed again
+        entries are keyed by the file fingerprint and everything that influences parsing
+        the fingerprint is path, size and modification time or the content hash if hashcontent is set
+        least recently used entries are evicted once the cache grows beyond maxsize bytes
+        entries are written as feather files, frames pyarrow can't store like mixed object columns are pickled
+        loading a pickle runs any code it holds, so only use a directory no one else can write to"""
+
+    suffixes = (".feather", ".pkl")
+
+    def __init__(self, directory, maxsize=1 << 30, hashcontent=False):
+        self.directory = Path(directory)
+        self.maxsize = maxsize
+        self.hashcontent = hashcontent
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def fingerprint(self, filename):
+        """fingerprint returns what identifies the current version of a file"""
+        if not self.hashcontent:
+            return _file_version(filename)
+        digest = hashlib.sha256()
+        with open(filename, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        return os.path.abspath(filename), os.path.getsize(filename), digest.hexdigest()
+
+    def key(self, filename, *parameters):
+        """key returns the cache key for a file parsed with the given parameters"""
+        return hashlib.sha256(repr((self.fingerprint(filename), parameters)).encode()).hexdigest()
+
+    def get(self, key):
+        """get returns the cached frame and encoding for key or None, entries that can't be loaded are deleted"""
+        for suffix in self.suffixes:
+            path = self.directory / f"{key}{suffix}"
+            try:
+                entry = _read_feather(path) if suffix == ".feather" else _read_pickle(path)
+            except FileNotFoundError:
+                continue
+            except Exception:
+                # truncated or written by other versions of pandas, pyarrow or python, the file is parsed again
+                try:
+                    path.unlink(missing_ok=True)
+                except OSError:
+                    pass
+                return None
+            os.utime(path)  # mark as recently used
+            return entry
+        return None
+
+    def put(self, key, entry):
+        """put stores the frame and encoding of entry under key
+            call evict afterwards to keep the cache within maxsize"""
+        frame, encoding = entry
+        for suffix in self.suffixes:
+            path = self.directory / f"{key}{suffix}"
+            tmp = path.with_suffix(f".{os.getpid()}.tmp")
+            try:
+                if suffix == ".feather":
+                    _write_feather(tmp, frame, encoding)
+                else:
+                    with open(tmp, "wb") as f:
+                        pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+            except (ImportError, ValueError, TypeError):
+                tmp.unlink(missing_ok=True)
+                continue
+            os.replace(tmp, path)
+            return
+
+    def __entries(self):
+        """__entries yields the paths of all entries"""
+        for suffix in self.suffixes:
+            yield from self.directory.glob(f"*{suffix}")
+
+    def evict(self):
+        """evict deletes least recently used entries until the cache fits into maxsize"""
+        entries = []
+        for path in self.__entries():
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime_ns, stat.st_size, path))
+        size = sum(entry[1] for entry in entries)
+        for _, entrysize, path in sorted(entries):
+            if size <= self.maxsize:
+                break
+            path.unlink(missing_ok=True)
+            size -= entrysize
+
+    def clear(self):
+        """clear deletes all entries"""
+        for path in list(self.__entries()):
+            path.unlink(missing_ok=True)
+
+
+def _write_feather(path, frame, encoding):
+    """_write_feather writes a frame and the encoding it was read with to a feather file
+        raises ValueError for frames that wouldn't read back the same like mixed column names or values"""
+    import pyarrow as pa
+    import pyarrow.feather as feather
+
+    if frame.columns.inferred_type not in ("string", "integer", "empty") or not frame.columns.is_unique:
+        raise ValueError("Column names can't be stored in a feather file")
+    try:
+        table = pa.Table.from_pandas(frame, preserve_index=None)
+    except pa.ArrowException as e:
+        raise ValueError(f"Data can't be stored in a feather file: {e}") from e
+    objects = [str(column) for column, dtype in frame.dtypes.items() if dtype == object]
+    metadata = {
+        b"csvxmlimporter.encoding": (encoding or "").encode(),
+        b"csvxmlimporter.objects": "\n".join(objects).encode(),
+    }
+    feather.write_feather(table.replace_schema_metadata({**(table.schema.metadata or {}), **metadata}), str(path))
+
+
+def _read_feather(path):
+    """_read_feather returns the frame and encoding written by _write_feather"""
+    import pyarrow.feather as feather
+
+    table = feather.read_table(str(path))
+    metadata = table.schema.metadata
+    frame = table.to_pandas()
+    # object columns come back as string dtype where pandas has one and with None for missing values
+    objects = set(metadata[b"csvxmlimporter.objects"].decode().split("\n")) - {""}
+    for column in frame.columns:
+        if str(column) in objects:
+            series = frame[column].astype(object)
+            frame[column] = series.where(series.notna(), np.nan)
+    return frame, metadata[b"csvxmlimporter.encoding"].decode() or None
+
+
+def _read_pickle(path):
+    """_read_pickle returns the frame and encoding of a pickled entry, this runs any code the file holds"""
+    with open(path, "rb") as f:
+        return pickle.load(f)
+
+
+class ImportCancelled(Exception):
+    """ImportCancelled is raised when the cancel event of a CsvXmlImporter was set while files were read or written"""
+
+
+class XslFileMissing(AttributeError):
+    """XslFileMissing is raised when xml files are read without a .xsl file set to transform them"""
+
+
+# file formats export_frame can write by file extension
+exportformats = {".csv": "csv", ".parquet": "parquet", ".pq": "parquet", ".feather": "feather", ".arrow": "feather"}
+
+
+def _mixed_columns(frame):
+    """_mixed_columns returns the object columns holding numbers and text like columns merged from files where
+        they were read as numbers in one and as text in another, arrow can't store them as they are"""
+    mixed = ("mixed", "mixed-integer")
+    return [column for column in frame.columns
+            if frame[column].dtype == object and pd.api.types.infer_dtype(frame[column], skipna=True) in mixed]
+
+
+def _as_text(chunk, columns):
+    """_as_text returns the chunk with the given columns converted to strings keeping missing values"""
+    if not columns:
+        return chunk
+    return chunk.assign(**{
+        column: chunk[column].astype(str).astype(object).where(chunk[column].notna(), None) for column in columns
+    })
+
+
+def _arrow_schema(frame, chunk, mixed=()):
+    """_arrow_schema returns the arrow schema of a chunk, columns that are empty in the chunk get their type from frame
+        the mixed columns are stored as strings see _mixed_columns"""
+    import pyarrow as pa
+
+    schema = pa.Schema.from_pandas(chunk, preserve_index=False)
+    for i, field in enumerate(schema):
+        if field.name in mixed:
+            schema = schema.set(i, field.with_type(pa.string()))
+        elif pa.types.is_null(field.type):
+            values = frame[field.name].dropna()
+            if len(values):
+                schema = schema.set(i, field.with_type(pa.array(values.iloc[:1]).type))
+    return schema
+
+
+def export_frame(frame, path, format=None, *, chunksize=100000, compression=None, progress=None, cancel=None,
+                 **kwargs):
+    """export_frame writes a dataframe to a csv, parquet or feather file chunk by chunk
+        format is csv, parquet or feather and taken from the file extension if not given
+        compression is passed to the parquet or feather writer like "snappy", "zstd" or "lz4"
+        all other keyword arguments are passed to pandas.DataFrame.to_csv for csv files, which are utf-8 by default
+        columns holding numbers and text are written to parquet and feather files as strings
+        progress is called with the path, the rows written and all rows after every chunk
+        cancel is an object like threading.Event, once it is set ImportCancelled is raised and no file is left
+        the file is written next to the destination and moved there when complete"""
+    path = str(path)
+    format = format or exportformats.get(os.path.splitext(path)[1].lower())
+    if format not in ("csv", "parquet", "feather"):
+        raise ValueError(f"Unknown export format for {path}")
+    if format == "csv" and compression is not None:
+        raise ValueError("Compression is only supported for parquet and feather files")
+
+    tmp = f"{path}.{os.getpid()}.tmp"
+    total = len(frame)
+    mixed = _mixed_columns(frame) if format != "csv" else []
+    writer = None
+    try:
+        if format == "csv":
+            writer = open(tmp, "w", newline="", encoding=kwargs.pop("encoding", None) or "utf-8")
+        for start in range(0, max(total, 1), chunksize):
+            if cancel is not None and cancel.is_set():
+                raise ImportCancelled(f"Export cancelled after {start} of {total} rows")
+            chunk = _as_text(frame.iloc[start:start + chunksize], mixed)
+            if format == "csv":
+                chunk.to_csv(writer, header=kwargs.get("header", True) if start == 0 else False,
+                             **{key: value for key, value in kwargs.items() if key != "header"})
+            else:
+                import pyarrow as pa
+
+                if writer is None:
+                    try:
+                        schema = _arrow_schema(frame, chunk, mixed)
+                    except pa.ArrowException as e:
+                        raise ValueError(f"Data can't be written to {path}: {e}") from e
+                    if format == "parquet":
+                        import pyarrow.parquet as pq
+                        writer = pq.ParquetWriter(tmp, schema, compression=compression or "snappy")
+                    else:
+                        options = pa.ipc.IpcWriteOptions(compression=None if compression in (None, "uncompressed")
+                                                         else compression)
+                        writer = pa.ipc.new_file(tmp, schema, options=options)
+                try:
+                    table = pa.Table.from_pandas(chunk, schema=schema, preserve_index=False)
+                except pa.ArrowException as e:
+                    raise ValueError(f"Data can't be written to {path}: {e}") from e
+                writer.write_table(table)
+            if progress:
+                progress(path, min(start + chunksize, total), total)
+        writer.close()
+        os.replace(tmp, path)
+    except BaseException:
+        if writer is not None:
+            writer.close()
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
 
 class CsvXmlImporter:
     __filenames: List[str]
-    __filebuffer: List[str]
-    dfx: pd.DataFrame
+    __encodings: Dict[str, str]
+    __detectsettings: Dict
+    __provenance: Optional[str]
+    __workers: Optional[int]
+    __executor: Optional[Executor]
+    __cache: Optional[ParseCache]
+    __xmlcache: tuple
+    __xmlrecords: Optional[tuple]
+    __infertypes: Optional[Dict]
+    __compact: Optional[Dict]
+    __observer: Optional[Callable]
+    __progress: Optional[Callable]
+    __cancel: Optional[object]
+    __results: Dict[str, tuple]
+    __watched: Dict[str, Optional[Dict]]
+    __select: Optional[tuple]
+    __key: Optional[tuple]
+    __keyindex: Optional[Dict]
+    __merged: Dict[str, tuple]
+    __deliveries: Dict[str, tuple]
+    __deliverycount: int
+    __mergedparameters: Optional[tuple]
+    __resultparameters: Optional[tuple]
+    __dfx: pd.DataFrame
+    __pending: bool
+    __batchdepth: int
     __pdreadcsvsettings: Optional[Dict]
     __xslparameter: Dict
     __xsldefaultparameter: Dict
-    __xmltransformer: etree.XSLT
+    __xslfile: Optional[str]
 
     def __init__(
             self,
             filenames: Optional[str or list] = [],
+            *,
+            detectsize: int = 1 << 16,
+            detectsamples: int = 0,
+            detectconfidence: float = 0.9,
+            provenance: Optional[str] = None,
+            workers: Optional[int] = None,
+            executor: Optional[Executor] = None,
+            cache: Optional[str or ParseCache] = None,
+            xmltreecachesize: int = 1,
+            xmlcachesize: int = 32,
+            xmlcachebytes: int = 1 << 26,
+            infertypes: bool = False,
+            infersample: Optional[int] = None,
+            categorythreshold: float = 0.5,
+            compact: bool = False,
+            observer: Optional[Callable] = None,
+            key: Optional[str or List[str]] = None,
+            progress: Optional[Callable] = None,
+            cancel: Optional[object] = None,
             **pdreadcsvsettings
     ):
+        """detectsize, detectsamples and detectconfidence control the encoding detection see detect_encoding
+            csv files are parsed from disk by the parser engine set with the engine setting like "c" or "pyarrow"
+            provenance names a column added to dfx that holds the file each row was read from
+            workers reads the files in a process pool of that size, alternatively an executor can be passed
+            cache is a directory or ParseCache to keep parsed files in between runs, frames pyarrow can't store
+            are pickled there and loaded again, so the directory must not be writable by others see ParseCache
+            xmltreecachesize and xmlcachesize bound how many parsed xml trees and xsl results this importer keeps
+            in memory, xmlcachebytes bounds each of the two caches by the size of the xml files and results
+            infertypes converts the columns of every file to the detected types, see infer_types for
+            infersample and categorythreshold
+            compact stores the columns of every file in the smallest dtypes before they are merged see compact_frame
+            observer is called with stage, filename, seconds, bytes and rows for every import stage see ImportStats
+            key names the column or columns identifying a row, see set_key
+            progress is called with filename, number of done files and number of files to read after every file
+            cancel is an object like threading.Event, once its is_set returns True the remaining files are not read
+            and ImportCancelled is raised, files read until then are kept and not read again on the next access
+            all other keyword arguments are passed to pandas.read_csv
+            an encoding passed here or via set_settings overrides the detection for all files"""
         self.__pdreadcsvsettings = pdreadcsvsettings
+        self.__detectsettings = dict(samplesize=detectsize, samplecount=detectsamples, confidence=detectconfidence)
+        self.__encodings = {}
+        self.__provenance = provenance
+        self.__workers = workers
+        self.__executor = executor
+        self.__cache = ParseCache(cache) if isinstance(cache, (str, Path)) else cache
+        self.__xmlcache = (next(_xmlcacheids), xmltreecachesize, xmlcachesize, xmlcachebytes)
+        weakref.finalize(self, _xmlcaches.pop, self.__xmlcache[0], None)
+        self.__xmlrecords = None
+        self.__infertypes = dict(sample=infersample, categorythreshold=categorythreshold) if infertypes else None
+        self.__compact = dict(categorythreshold=categorythreshold) if compact else None
+        self.__observer = observer
+        self.__progress = progress
+        self.__cancel = cancel
         self.__xslparameter = {}
         self.__xsldefaultparameter = {}
+        self.__xslfile = None
         self.__filenames = []
-        self.__filebuffer = []
+        self.__results = {}
+        self.__resultparameters = None
+        self.__watched = {}
+        self.__select = None
+        self.__key = ((key,) if isinstance(key, str) else tuple(key)) if key is not None else None
+        self.__keyindex = None
+        self.__merged = {}
+        self.__mergedparameters = None
+        self.__deliveries = {}
+        self.__deliverycount = 0
+        self.__dfx = pd.DataFrame()
+        self.__pending = False
+        self.__batchdepth = 0
 
         if filenames:
             self.update_files(*filenames if type(filenames) == list else filenames)
-        else:
-            self.dfx = pd.DataFrame()
+
+    @property
+    def dfx(self):
+        """dfx is the dataframe of the combined files, pending changes are applied on first access"""
+        if self.__pending:
+            self.__apply()
+        return self.__dfx
+
+    @dfx.setter
+    def dfx(self, dfx):
+        self.__dfx = dfx
+        self.__pending = False
+
+    def __apply(self):
+        """__apply reads all changed files and merges them to dfx applying all recorded changes in one pass"""
+        if self.__filenames:
+            # guess settings without overwriting existing ones
+            start = perf_counter() if self.__observer else None
+            self.__guess_settings_from(self.__filenames)
+            if self.__observer:
+                self.__observer("guess", None, perf_counter() - start, None, None)
+
+            # read and parse every changed file
+            # a change in settings or xsl parameters causes all files to be read in new
+            self.__load_files(self.__filenames)
+        self.__merge()
+
+    def __changed(self):
+        """__changed records a change of settings that requires the files to be read in new on next access"""
+        if self.__filenames:
+            self.__pending = True
+
+    def __refresh(self):
+        """__refresh applies recorded changes right away unless inside a batch"""
+        self.__pending = True
+        if not self.__batchdepth:
+            self.__apply()
+
+    @contextmanager
+    def batch(self):
+        """batch is a context manager to apply several changes at once
+            files and settings changed inside the with block are read in one pass when the block is left"""
+        self.__batchdepth += 1
+        try:
+            yield self
+        finally:
+            self.__batchdepth -= 1
+        if not self.__batchdepth and self.__pending:
+            self.__apply()
 
     @staticmethod
     def __validate_filenames(*filenames):
@@ -70,15 +1227,21 @@ class CsvXmlImporter:
             if not filename.endswith((".xml", ".csv")):
                 raise ValueError(f'File {filename} has invalid file extension')
 
-    def __read_csv(self, filename):
-        """__read_csv opens a given csv file and return its content as text"""
-        enc = detect(Path(filename).read_bytes())["encoding"]
-        self.__pdreadcsvsettings.update(encoding=enc)  # save encoding
-        return Path(filename).read_text(encoding=enc)
+    def __detect_encoding(self, filename):
+        """__detect_encoding returns the encoding set in the settings or else detects it and records it per file"""
+        enc = self.__pdreadcsvsettings.get("encoding") or detect_encoding(filename, **self.__detectsettings)
+        self.__encodings[filename] = enc  # save encoding
+        return enc
+
+    def __read_head(self, filename):
+        """__read_head returns the first two lines of a given csv file as text without reading the whole file"""
+        return _read_head(filename, self.__detect_encoding(filename))
 
     def __read_xml(self, filename):
         """__read_xml opens a given xml file and return its content as csv text"""
-        return str(self.__xmltransformer(etree.parse(filename), **self.__xslparameter))
+        if self.__xslfile is None:
+            raise XslFileMissing("No .xsl file set")
+        return _read_xml(filename, self.__xslfile, self.__xslparameter, _xml_caches(*self.__xmlcache))
 
     def __ascertain_settings(self, file):
         """__ascertain_settings returns settings for csv file by checking its file content"""
@@ -105,115 +1268,728 @@ class CsvXmlImporter:
 
         return settings
 
-    def __ascertain_header(self, file):
-        """__ascertain_header returns an dic with information about the header of a given csv file"""
-        settings = {}
+    def __guess_settings(self, file):
+        """__guess_settings adds settings guessed from the file content to the settings
+            without overwriting existing ones"""
+        settings = self.__ascertain_settings(file)
+        self.__pdreadcsvsettings.update(
+            delimiter=settings["delimiter"] if "delimiter" not in self.__pdreadcsvsettings else
+            self.__pdreadcsvsettings["delimiter"],
+            doublequote=settings["doublequote"] if "doublequote" not in self.__pdreadcsvsettings else
+            self.__pdreadcsvsettings["doublequote"],
+            escapechar=settings["escapechar"] if "escapechar" not in self.__pdreadcsvsettings else
+            self.__pdreadcsvsettings["escapechar"],
+            quotechar=settings["quotechar"] if "quotechar" not in self.__pdreadcsvsettings else
+            self.__pdreadcsvsettings["quotechar"],
+            quoting=settings["quoting"] if "quoting" not in self.__pdreadcsvsettings else
+            self.__pdreadcsvsettings["quoting"],
+            skipinitialspace=settings["skipinitialspace"] if "skipinitialspace" not in self.__pdreadcsvsettings else
+            self.__pdreadcsvsettings["skipinitialspace"],
+            true_values=settings["true_values"] if "true_values" not in self.__pdreadcsvsettings else
+            self.__pdreadcsvsettings["true_values"],
+            false_values=settings["false_values"] if "false_values" not in self.__pdreadcsvsettings else
+            self.__pdreadcsvsettings["false_values"],
+        )
 
-        with StringIO(file) as f:
-            sample = f.readline() + f.readline()
+    def __options(self):
+        """__options returns everything besides the file itself that influences how a file is parsed see _load_file"""
+        return dict(
+            settings=self.__pdreadcsvsettings,
+            detectsettings=self.__detectsettings,
+            xslfile=self.__xslfile,
+            xslparameter=self.__xslparameter,
+            xmlcache=self.__xmlcache,
+            xmlrecords=self.__xmlrecords,
+            select=self.__select,
+            infertypes=self.__infertypes,
+            compact=self.__compact,
+            timed=self.__observer is not None,
+        )
 
-            if csv.Sniffer().has_header(sample):
-                settings.update(
-                    header=0
-                )
+    def __parameters(self):
+        """__parameters returns the options in comparable form with the version of the xsl file"""
+        return (
+            sorted(self.__pdreadcsvsettings.items()),
+            sorted(self.__detectsettings.items()),
+            _file_version(self.__xslfile) if self.__xslfile else None,
+            sorted(self.__xslparameter.items()),
+            self.__xmlrecords,
+            self.__select,
+            sorted(self.__infertypes.items()) if self.__infertypes else None,
+            sorted(self.__compact.items()) if self.__compact else None,
+        )
+
+    def __load_files(self, filenames):
+        """__load_files reads and parses the given files serial or in the configured executor
+            results of files that did not change since they were last parsed with the same parameters are reused
+            returns the dataframes in order of the filenames"""
+        if self.__xslfile is None and not self.__xmlrecords and any(name.endswith(".xml") for name in filenames):
+            raise XslFileMissing("No .xsl file set")
+
+        parameters = self.__parameters()
+        if parameters != self.__resultparameters:
+            self.__results = {}
+            self.__resultparameters = parameters
+
+        versions = {filename: _file_version(filename) for filename in filenames if os.path.exists(filename)}
+        pending = [
+            filename for filename in dict.fromkeys(filenames)
+            if filename not in self.__results or self.__results[filename][0] != versions.get(filename)
+        ]
+
+        if self.__observer:
+            for filename in dict.fromkeys(filenames):
+                if filename not in pending:
+                    self.__observer("reused", filename, 0.0, None, len(self.__results[filename][1][0]))
+
+        done = 0
+
+        def store(filename, result, key=None):
+            """store keeps the result of a file so a cancelled or failed run doesn't lose it"""
+            nonlocal done
+            self.__store_result(filename, versions[filename], result, key)
+            done += 1
+            if self.__progress:
+                self.__progress(filename, done, len(pending))
+
+        def cancelled():
+            return self.__cancel is not None and self.__cancel.is_set()
+
+        # take what is in the cache and only read the rest
+        cache = self.__usable_cache()
+        unread = []
+        for filename in pending:
+            result = None
+            if cache is not None and filename in versions:
+                start = perf_counter() if self.__observer else None
+                key = cache.key(filename, *parameters)
+                result = cache.get(key)
+                if result is None:
+                    unread.append((filename, key))
+                    continue
+                if self.__observer:
+                    self.__observer("cache_hit", filename, perf_counter() - start, versions[filename][1],
+                                    len(result[0]))
+                store(filename, (*result, None))
             else:
-                f.seek(0)
-                firstline = next(
-                    csv.reader(
-                        f,
-                        delimiter=self.__pdreadcsvsettings["delimiter"],
-                        doublequote=self.__pdreadcsvsettings["doublequote"],
-                        escapechar=self.__pdreadcsvsettings["escapechar"],
-                        quotechar=self.__pdreadcsvsettings["quotechar"],
-                        quoting=self.__pdreadcsvsettings["quoting"],
-                        skipinitialspace=self.__pdreadcsvsettings["skipinitialspace"],
-                    )
-                )
-                headernames = []
-                for i, item in enumerate(firstline):
-                    headernames.append(f'{i}_{self.__check_type(item)}')
-                settings.update(
-                    header=None,
-                    names=headernames
-                )
+                unread.append((filename, None))
 
-        return settings
+        options = self.__options()
+        executor = self.__executor
+        if executor is None and self.__workers and unread:
+            executor = ProcessPoolExecutor(self.__workers)
 
-    @staticmethod
-    def __check_type(string):
-        """check whether given input string matches any of the predetermined types
-            returns matching type or 'String'"""
-        for key in types:
-            if types[key].match(string):
-                return key
-        return "String"
+        try:
+            if executor is None:
+                for filename, key in unread:
+                    if cancelled():
+                        raise ImportCancelled(f"Import cancelled after {done} of {len(pending)} files")
+                    try:
+                        result = _load_file(filename, options)
+                    except Exception as e:
+                        raise ValueError(f'File {filename} could not be read: {e}') from e
+                    store(filename, result, key)
+            else:
+                futures = {executor.submit(_load_file, filename, options): (filename, key) for filename, key in unread}
+                remaining = set(futures)
+                try:
+                    while remaining:
+                        # wake up regularly to notice a cancellation while long files are read
+                        finished, remaining = wait(remaining, timeout=0.1, return_when=FIRST_COMPLETED)
+                        for future in finished:
+                            filename, key = futures[future]
+                            try:
+                                result = future.result()
+                            except Exception as e:
+                                raise ValueError(f'File {filename} could not be read: {e}') from e
+                            store(filename, result, key)
+                        if remaining and cancelled():
+                            raise ImportCancelled(f"Import cancelled after {done} of {len(pending)} files")
+                finally:
+                    for future in remaining:
+                        future.cancel()
+        finally:
+            if executor is not None and executor is not self.__executor:
+                executor.shutdown()
+            if cache is not None and done:
+                cache.evict()
+
+        frames = []
+        for filename in filenames:
+            frame, encoding = self.__results[filename][1]
+            if encoding:
+                self.__encodings[filename] = encoding
+            frames.append(frame)
+        return frames
+
+    def __usable_cache(self):
+        """__usable_cache returns the parse cache unless rows are selected by a function
+            the repr of a function holds its address which changes with every run,
+            so its entries would never be found"""
+        if self.__select is not None and callable(self.__select[1]):
+            return None
+        return self.__cache
+
+    def __store_result(self, filename, version, result, key=None):
+        """__store_result keeps the parsed result of a file, reports its timed stages and puts it in the cache"""
+        frame, encoding, events = result
+        for stage, seconds, nbytes, rows in events or ():
+            self.__observer(stage, filename, seconds, nbytes, rows)
+        if key is not None:
+            self.__cache.put(key, (frame, encoding))
+        self.__results[filename] = version, (frame, encoding)
+
+    async def __aload_files(self, filenames, concurrency):
+        """__aload_files is the asyncio counterpart of __load_files yielding filename and dataframe of every file
+            as soon as it is parsed, at most concurrency files are read at once
+            stat calls and the cache run in threads and the parsing in the executor or process pool of the importer
+            or else in threads, so slow file shares neither block the event loop nor wait for each other"""
+        # asyncio is imported here as it takes longer to import than the rest of this module
+        import asyncio
+
+        if self.__xslfile is None and not self.__xmlrecords and any(name.endswith(".xml") for name in filenames):
+            raise XslFileMissing("No .xsl file set")
+
+        parameters = self.__parameters()
+        if parameters != self.__resultparameters:
+            self.__results = {}
+            self.__resultparameters = parameters
+        options = self.__options()
+        loop = asyncio.get_running_loop()
+        executor = self.__executor
+        if executor is None and self.__workers:
+            executor = ProcessPoolExecutor(self.__workers)
+        cache = self.__usable_cache()
+        semaphore = asyncio.Semaphore(concurrency)
+        pending = [*dict.fromkeys(filenames)]
+        done = 0
+
+        async def load(filename):
+            nonlocal done
+            async with semaphore:
+                if self.__cancel is not None and self.__cancel.is_set():
+                    raise ImportCancelled(f"Import cancelled after {done} of {len(pending)} files")
+                try:
+                    version = await loop.run_in_executor(None, _file_version, filename)
+                    result = self.__results.get(filename)
+                    if result is None or result[0] != version:
+                        key = cached = None
+                        if cache is not None:
+                            # the key may hash the whole file content
+                            key = await loop.run_in_executor(None, cache.key, filename, *parameters)
+                            cached = await loop.run_in_executor(None, cache.get, key)
+                        if cached is not None:
+                            self.__store_result(filename, version, (*cached, None))
+                        else:
+                            parsed = await loop.run_in_executor(executor, _load_file, filename, options)
+                            await loop.run_in_executor(None, self.__store_result, filename, version, parsed, key)
+                except ImportCancelled:
+                    raise
+                except Exception as e:
+                    raise ValueError(f'File {filename} could not be read: {e}') from e
+            frame, encoding = self.__results[filename][1]
+            if encoding:
+                self.__encodings[filename] = encoding
+            done += 1
+            if self.__progress:
+                self.__progress(filename, done, len(pending))
+            return filename, frame
+
+        tasks = [asyncio.ensure_future(load(filename)) for filename in pending]
+        try:
+            for task in asyncio.as_completed(tasks):
+                yield await task
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            if cache is not None and done:
+                await loop.run_in_executor(None, cache.evict)
+            if executor is not None and executor is not self.__executor:
+                await loop.run_in_executor(None, executor.shutdown)
+
+    def __merge(self):
+        """__merge merges the parsed files to dfx
+            with a key new files are upserted as long as no merged file changed or was removed and the parameters
+            did not change, otherwise dfx is built from all files in the order they were delivered keeping the last
+            row of every key, so dfx only depends on the files and the order they came in"""
+        start = perf_counter() if self.__observer else None
+        if self.__key is None:
+            frames = [self.__results[filename][1][0] for filename in self.__filenames]
+            self.dfx = merge_frames(frames, self.__filenames, self.__provenance)
+        elif self.__keyindex is None or self.__mergedparameters != self.__resultparameters \
+                or any(filename not in self.__filenames for filename in self.__merged) \
+                or any(self.__merged.get(filename, version) != version
+                       for filename, (version, _) in self.__results.items() if filename in self.__filenames):
+            self.__rebuild()
+        else:
+            for filename in self.__filenames:
+                version, (frame, _) = self.__results[filename]
+                if self.__merged.get(filename) != version:
+                    self.__segments(filename)
+                    self.__upsert(filename, frame)
+                    self.__merged[filename] = version
+            self.dfx = self.__dfx
+        if self.__observer:
+            self.__observer("merge", None, perf_counter() - start, None, len(self.__dfx))
+
+    def __rebuild(self):
+        """__rebuild builds dfx and the key index from all files, the rows of every file are merged in the order
+            they were delivered and the last row of a key takes the place of its first like an upsert would"""
+        frames, sources, sequences = [], [], []
+        for filename in self.__filenames:
+            frame = self.__results[filename][1][0]
+            self.__check_key(filename, frame)
+            start = 0
+            for sequence, rows in self.__segments(filename):
+                frames.append(frame.iloc[start:start + rows])
+                sources.append(filename)
+                sequences.append(sequence)
+                start += rows
+        order = sorted(range(len(frames)), key=sequences.__getitem__)
+        dfx = merge_frames([frames[i] for i in order], [sources[i] for i in order], self.__provenance)
+        if len(dfx.columns):
+            groups = dfx.groupby([*self.__key], sort=False, dropna=False).ngroup().to_numpy()
+            last = ~dfx.duplicated(subset=[*self.__key], keep="last").to_numpy()
+            dfx = dfx[last].iloc[np.argsort(groups[last], kind="stable")].reset_index(drop=True)
+            if self.__provenance:
+                # the files and not their deliveries decide the order of the categories like without a key
+                dfx[self.__provenance] = dfx[self.__provenance].cat.set_categories([*dict.fromkeys(self.__filenames)])
+        self.__keyindex = {value: i for i, value in enumerate(_key_values(dfx, self.__key))} \
+            if len(dfx.columns) else {}
+        self.__merged = {filename: self.__results[filename][0] for filename in self.__filenames}
+        self.__mergedparameters = self.__resultparameters
+        self.dfx = dfx
+
+    def __segments(self, filename, appended=None):
+        """__segments returns delivery number and row count of the parts of a file in the order they were read
+            a new or changed file is one delivery after all earlier ones, lines appended to a watched file are
+            passed as appended and become a delivery of their own"""
+        version, (frame, _) = self.__results[filename]
+        known, segments = self.__deliveries.get(filename, (None, []))
+        if appended is not None:
+            segments = [*segments, (self.__deliverycount, appended)] if appended else segments
+            self.__deliverycount += bool(appended)
+        elif known != version:
+            segments = [(self.__deliverycount, len(frame))]
+            self.__deliverycount += 1
+        elif sum(rows for _, rows in segments) != len(frame):
+            # read in new with other parameters, the appended lines can't be told apart any more
+            segments = [(segments[-1][0], len(frame))]
+        self.__deliveries[filename] = version, segments
+        return segments
+
+    def __check_key(self, filename, frame):
+        """__check_key raises a ValueError if a frame lacks any of the key columns"""
+        missing = [column for column in self.__key if column not in frame.columns]
+        if missing and len(frame.columns):
+            raise ValueError(f'File {filename} lacks the key columns {", ".join(missing)}')
+
+    def __upsert(self, filename, frame):
+        """__upsert writes the rows of a frame into dfx, rows whose key is already in dfx are replaced in place
+            and the others are appended, the hash index from key to row keeps the work proportional to the frame
+            apart from appending, which copies dfx like any concatenation"""
+        self.__check_key(filename, frame)
+        if not len(frame):
+            return
+        frame = merge_frames([frame.drop_duplicates(subset=[*self.__key], keep="last")], [filename], self.__provenance)
+        dfx = self.__dfx
+        added = [column for column in frame.columns if column not in dfx.columns]
+        if added and len(dfx.columns):
+            for column in added:
+                dfx[column] = pd.Series(index=dfx.index, dtype=common_dtype([frame[column].dtype], missing=True))
+            if self.__provenance:
+                # keep the provenance column last like merge_frames does
+                dfx = dfx[[*(column for column in dfx.columns if column != self.__provenance), self.__provenance]]
+        values = _key_values(frame, self.__key)
+        positions = np.array([self.__keyindex.get(value, -1) for value in values], dtype=np.intp)
+        existing = positions >= 0
+
+        if existing.any():
+            updated = frame[existing]
+            rows = positions[existing]
+            for i, column in enumerate(dfx.columns):
+                source = updated[column] if column in updated.columns else None
+                dtype = common_dtype([dfx[column].dtype] + ([source.dtype] if source is not None else []),
+                                     missing=source is None)
+                if dtype != dfx[column].dtype:
+                    dfx[column] = dfx[column].astype(dtype)
+                dfx.iloc[rows, i] = source.to_numpy() if source is not None else None
+
+        if not existing.all():
+            appended = frame[~existing]
+            for value, position in zip(_key_values(appended, self.__key), range(len(dfx), len(dfx) + len(appended))):
+                self.__keyindex[value] = position
+            dfx = merge_frames([frame for frame in (dfx, appended) if len(frame.columns)])
+        self.__dfx = dfx
+
+    def __guess_settings_from(self, filenames):
+        """__guess_settings_from guesses missing settings from the content of the first file that yields csv text
+            xml files streamed as records have no csv text and are skipped"""
+        guessed = ("delimiter", "doublequote", "escapechar", "quotechar", "quoting", "skipinitialspace",
+                   "true_values", "false_values")
+        if all(key in self.__pdreadcsvsettings for key in guessed):
+            return
+        for filename in filenames:
+            if filename.endswith(".csv"):
+                self.__guess_settings(self.__read_head(filename))
+                return
+            if not self.__xmlrecords:
+                self.__guess_settings(self.__read_xml(filename))
+                return
+
+    async def aiter_files(self, *filenames: str, concurrency: int = 8):
+        """aiter_files is an async generator yielding filename and dataframe of the files in the order they finish
+            without filenames the files of the importer are used, the results are kept so a following update_files
+            or aupdate_files of the same files only merges them, dfx is not touched"""
+        import asyncio
+
+        filenames = [*filenames] or self.__filenames
+        self.__validate_filenames(*filenames)
+        await asyncio.get_running_loop().run_in_executor(None, self.__guess_settings_from, filenames)
+        async for filename, frame in self.__aload_files(filenames, concurrency):
+            yield filename, frame
+
+    async def aupdate_files(self, *filenames: str, concurrency: int = 8):
+        """aupdate_files is the asyncio counterpart of update_files and returns dfx
+            up to concurrency files are read at once and the event loop is not blocked while reading or merging
+            the importer must not be changed while it runs, a file that can't be read leaves it unchanged"""
+        import asyncio
+
+        filenames = [*filenames] or self.__filenames
+        async for _ in self.aiter_files(*filenames, concurrency=concurrency):
+            pass
+        if filenames != self.__filenames:
+            self.__filenames = [*filenames]
+            self.__encodings = {filename: self.__encodings[filename] for filename in filenames
+                                if filename in self.__encodings}
+            self.__results = {filename: self.__results[filename] for filename in filenames
+                              if filename in self.__results}
+            self.__deliveries = {filename: self.__deliveries[filename] for filename in filenames
+                                 if filename in self.__deliveries}
+        await asyncio.get_running_loop().run_in_executor(None, self.__merge)
+        return self.__dfx
 
     def update_files(self, *filenames: str):
         """update_files can be called in two scenarios
             1. without parameters after changing the settings to reread the files with new settings
             2. with parameter to read in new files
+            inside a batch the files are read when the batch is left
             """
-        # read csv files as string into buffer
         if filenames and [*filenames] != self.__filenames:
             self.__validate_filenames(*filenames)
-
-            self.__filebuffer = [""] * len(filenames)
-            for i, filename in enumerate(filenames):
-                if filename.endswith(".csv"):
-                    self.__filebuffer[i] = self.__read_csv(filename)
-
             self.__filenames = [*filenames]
+            self.__encodings = {}
+            self.__results = {filename: self.__results[filename] for filename in filenames
+                              if filename in self.__results}
+            self.__deliveries = {filename: self.__deliveries[filename] for filename in filenames
+                                 if filename in self.__deliveries}
 
         if self.__filenames:
-            # read xml files as csv string into buffer
-            # xml have to be read in new everytime to ensure a change in xsl parameters gets applied
-            for i, filename in enumerate(self.__filenames):
-                if filename.endswith(".xml"):
-                    self.__filebuffer[i] = self.__read_xml(filename)
+            self.__refresh()
 
-            # guess settings without overwriting existing ones
-            settings = self.__ascertain_settings(self.__filebuffer[0])
-            self.__pdreadcsvsettings.update(
-                delimiter=settings["delimiter"] if "delimiter" not in self.__pdreadcsvsettings else
-                self.__pdreadcsvsettings["delimiter"],
-                doublequote=settings["doublequote"] if "doublequote" not in self.__pdreadcsvsettings else
-                self.__pdreadcsvsettings["doublequote"],
-                escapechar=settings["escapechar"] if "escapechar" not in self.__pdreadcsvsettings else
-                self.__pdreadcsvsettings["escapechar"],
-                quotechar=settings["quotechar"] if "quotechar" not in self.__pdreadcsvsettings else
-                self.__pdreadcsvsettings["quotechar"],
-                quoting=settings["quoting"] if "quoting" not in self.__pdreadcsvsettings else
-                self.__pdreadcsvsettings["quoting"],
-                skipinitialspace=settings["skipinitialspace"] if "skipinitialspace" not in self.__pdreadcsvsettings else
-                self.__pdreadcsvsettings["skipinitialspace"],
-                true_values=settings["true_values"] if "true_values" not in self.__pdreadcsvsettings else
-                self.__pdreadcsvsettings["true_values"],
-                false_values=settings["false_values"] if "false_values" not in self.__pdreadcsvsettings else
-                self.__pdreadcsvsettings["false_values"],
+    def add_files(self, *filenames: str):
+        """add_files reads in the given files in addition to the already imported ones
+            only the new files are parsed, inside a batch when the batch is left"""
+        self.__validate_filenames(*filenames)
+        if not filenames:
+            return
+        if not self.__batchdepth and not self.__pending:
+            # read the new files before adding them so a file that can't be read leaves the importer unchanged
+            self.__guess_settings_from([*self.__filenames, *filenames])
+            self.__load_files([*filenames])
+        self.__filenames += filenames
+        self.__refresh()
+
+    def remove_files(self, *filenames: str):
+        """remove_files removes the given files from the imported ones without parsing the others again"""
+        self.__filenames = [filename for filename in self.__filenames if filename not in filenames]
+        for filename in filenames:
+            self.__results.pop(filename, None)
+            self.__encodings.pop(filename, None)
+            self.__watched.pop(filename, None)
+            self.__deliveries.pop(filename, None)
+        self.__refresh()
+
+    def __tail(self, filename, version):
+        """__tail parses the complete lines appended to a csv file since it was last tailed
+            the file is read from the start if it is new, was rewritten or was read in new in the meantime
+            encoding, dialect and header found on the first read are reused for the appended lines
+            returns the parsed lines and whether the earlier rows of the file were replaced"""
+        tail = self.__watched.get(filename)
+        result = self.__results.get(filename)
+        with open(filename, "rb") as f:
+            if tail is not None:
+                head = f.read(len(tail["head"]))
+                if version[1] < tail["offset"] or head != tail["head"] or result is None \
+                        or result[0] != tail["version"]:
+                    # rewritten or read in new in the meantime, so the offset is no longer valid
+                    tail = None
+            replaced = tail is None and result is not None
+            if tail is None:
+                encoding = self.__detect_encoding(filename)
+                # a pure ascii file may get any utf-8 text appended
+                tail = dict(offset=0, head=b"", state=None, rest="", header=None,
+                            encoding="utf-8" if encoding == "ascii" else encoding)
+            f.seek(tail["offset"])
+            data = f.read(version[1] - tail["offset"])
+        # the state is advanced on a copy and only kept once the lines are parsed, so a failed poll reads them again
+        tail = {**tail, "offset": tail["offset"] + len(data), "version": version, "head": tail["head"] or data[:64]}
+
+        settings = {key: value for key, value in self.__pdreadcsvsettings.items() if key != "encoding"}
+        try:
+            decoder = codecs.getincrementaldecoder(tail["encoding"])()
+            if tail["state"] is not None:
+                decoder.setstate(tail["state"])
+            # only complete lines are parsed, the rest waits for the next poll
+            text = tail["rest"] + decoder.decode(data)
+            tail["state"] = decoder.getstate()
+            end = text.rfind("\n") + 1
+            text, tail["rest"] = text[:end], text[end:]
+            if tail["header"] is None and text.count("\n") < 2:
+                # the header can only be told apart from the data once there are two lines
+                text, tail["rest"] = "", text + tail["rest"]
+            if tail["header"] is None:
+                if not text:
+                    frame = pd.DataFrame()
+                else:
+                    header = _ascertain_header(text, self.__pdreadcsvsettings)
+                    frame = pd.read_csv(StringIO(text), **_engine_settings(settings), **header)
+                    # all columns are parsed once to know the names of the appended lines
+                    tail["header"] = dict(header=None, names=[*frame.columns])
+                    frame = _select(frame, self.__select)
+            elif text:
+                frame = _read_selected(StringIO(text), _engine_settings(settings), tail["header"], self.__select)
+            else:
+                frame = _select(pd.DataFrame(columns=tail["header"]["names"]), self.__select)
+            frame = _convert_frame(frame, self.__options())
+        except Exception as e:
+            raise ValueError(f'File {filename} could not be read: {e}') from e
+
+        self.__watched[filename] = tail
+        self.__encodings[filename] = tail["encoding"]
+        self.__resultparameters = self.__parameters()
+        rows = frame
+        if result is not None and not replaced and len(result[1][0].columns):
+            rows = merge_frames([result[1][0], frame])
+        self.__results[filename] = version, (rows, tail["encoding"])
+        return frame, replaced
+
+    def poll_files(self, pattern: str):
+        """poll_files brings the importer up to date with the .csv and .xml files matching a directory or glob pattern
+            new files are added and removed files are removed, of csv files only the lines appended since the last
+            poll are parsed, changed xml files and rewritten csv files are read in new
+            dfx is extended by the new rows without merging all files again if no file was replaced or removed
+            returns the new rows as dataframe and the files whose earlier rows were replaced or removed"""
+        if os.path.isdir(pattern):
+            pattern = os.path.join(pattern, "*")
+        filenames = sorted(filename for filename in glob.glob(pattern) if filename.endswith((".csv", ".xml")))
+        # a pending change of the settings reads every file in new anyway
+        if self.__pending:
+            self.__apply()
+
+        removed = [filename for filename in self.__watched if filename not in filenames]
+        for filename in removed:
+            del self.__watched[filename]
+            self.__deliveries.pop(filename, None)
+            self.__results.pop(filename, None)
+            self.__encodings.pop(filename, None)
+        self.__filenames = [filename for filename in self.__filenames if filename not in removed]
+
+        self.__guess_settings_from(filenames)
+        frames, sources, replaced = [], [], [*removed]
+        for filename in filenames:
+            try:
+                version = _file_version(filename)
+            except FileNotFoundError:
+                # removed since the directory was listed, the next poll removes it
+                continue
+            result = self.__results.get(filename)
+            if result is not None and result[0] == version and filename in self.__watched:
+                continue
+            if filename.endswith(".csv"):
+                frame, rewritten = self.__tail(filename, version)
+            else:
+                rewritten = result is not None
+                self.__watched[filename] = None
+                frame = self.__load_files([filename])[0]
+            if filename not in self.__filenames:
+                self.__filenames.append(filename)
+            if rewritten:
+                replaced.append(filename)
+            elif len(frame):
+                frames.append(frame)
+                sources.append(filename)
+
+        delta = merge_frames(frames, sources, self.__provenance)
+        if self.__key is not None:
+            # appended lines are a delivery of their own, a rewritten file becomes one as a whole once merged
+            appended = dict.fromkeys(filenames, 0)
+            appended.update((filename, len(frame)) for frame, filename in zip(frames, sources))
+            for filename in filenames:
+                if filename not in replaced and filename in self.__results \
+                        and self.__merged.get(filename) != self.__results[filename][0]:
+                    self.__segments(filename, appended[filename])
+        if replaced or (self.__key is not None and self.__keyindex is None):
+            self.__merge()
+        elif self.__key is not None:
+            # only the appended lines are upserted instead of the whole file
+            for frame, filename in zip(frames, sources):
+                self.__upsert(filename, frame)
+            for filename in filenames:
+                if filename in self.__results:
+                    self.__merged[filename] = self.__results[filename][0]
+            self.dfx = self.__dfx
+        elif len(delta):
+            self.dfx = merge_frames([frame for frame in (self.__dfx, delta) if len(frame.columns)])
+        return delta, replaced
+
+    def watch_files(self, pattern: str, callback: Optional[Callable] = None, interval: float = 1.0,
+                    cancel: Optional[object] = None):
+        """watch_files polls the files matching a directory or glob pattern every interval seconds see poll_files
+            callback is called with the new rows and the replaced or removed files whenever something changed
+            runs until cancel or else the cancel event of the importer is set"""
+        cancel = cancel or self.__cancel
+        while cancel is None or not cancel.is_set():
+            delta, replaced = self.poll_files(pattern)
+            if callback and (len(delta) or replaced):
+                callback(delta, replaced)
+            if hasattr(cancel, "wait"):
+                cancel.wait(interval)
+            else:
+                sleep(interval)
+
+    def iter_chunks(self, *filenames: str, chunksize: int = 100000):
+        """iter_chunks yields the content of the files as dataframes of at most chunksize rows file by file
+            csv files are parsed straight from disk so only one chunk is held in memory at a time
+            without filenames the files of the importer are used, dfx is not touched either way
+            settings are guessed from the first file like in update_files and the selection of select is applied"""
+        filenames = [*filenames] or self.__filenames
+        self.__validate_filenames(*filenames)
+
+        self.__guess_settings_from(filenames)
+
+        for filename in filenames:
+            if filename.endswith(".xml") and self.__xmlrecords:
+                record, fields, _ = self.__xmlrecords
+                if self.__select is not None and self.__select[2] is not None:
+                    fields = [(column, path) for column, path in fields if column in self.__select[2]]
+                for chunk in _iter_xml_records(filename, record, fields, chunksize):
+                    yield _select(chunk, self.__select)
+                continue
+            elif filename.endswith(".csv"):
+                head = self.__read_head(filename)
+                source = filename
+            else:
+                head = self.__read_xml(filename)
+                source = StringIO(head)
+
+            # the pyarrow engine can't read in chunks
+            settings = {**self.__pdreadcsvsettings, "encoding": self.__encodings.get(filename)}
+            if settings.get("engine") == "pyarrow":
+                settings.pop("engine")
+            if self.__select is not None and self.__select[2] is not None:
+                wanted = set(self.__select[2])
+                settings["usecols"] = lambda column: column in wanted
+            reader = pd.read_csv(
+                source,
+                chunksize=chunksize,
+                **_engine_settings(settings, path=source is filename),
+                **_ascertain_header(head, self.__pdreadcsvsettings)
             )
+            try:
+                for chunk in reader:
+                    yield _select(chunk, self.__select)
+            finally:
+                reader.close()
 
-            # merge filestrings in buffer to one dataframe
-            self.dfx = pd.DataFrame()
-            for file in self.__filebuffer:
-                self.dfx = self.dfx.append(
-                    pd.read_csv(
-                        StringIO(file),
-                        **self.__pdreadcsvsettings,
-                        **self.__ascertain_header(file)
-                    )
-                )
+    def preview(self, *filenames: str, rows: int = 100):
+        """preview returns the first rows of the merged files without reading them completely
+            only the head of every file is parsed until rows are collected, so the preview is available
+            long before a large import finishes, types are not inferred
+            without filenames the files of the importer are used and dfx is used if it is up to date"""
+        if not filenames and not self.__pending:
+            return self.__dfx.head(rows)
+        frames, sources = [], []
+        for filename in filenames or self.__filenames:
+            if rows <= 0:
+                break
+            chunks = self.iter_chunks(filename, chunksize=rows)
+            try:
+                frame = next(chunks, None)
+            finally:
+                chunks.close()
+            if frame is not None:
+                frames.append(frame)
+                sources.append(filename)
+                rows -= len(frame)
+        return merge_frames(frames, sources, self.__provenance)
+
+    def get_page(self, page: int, pagesize: int = 1000):
+        """get_page returns the rows of dfx on the given page counted from 0 with pagesize rows per page"""
+        return self.dfx.iloc[page * pagesize:(page + 1) * pagesize]
 
     def set_xslfile(self, filename):
         """set_xslfile sets a new .xsl file to use for converting .xml files to .csv"""
-        tree = etree.parse(filename)
-        self.__xmltransformer = etree.XSLT(tree)
+        _, tree = _get_transformer(filename)
+        self.__xslfile = filename
         self.__xslparameter = {x.attrib["name"]: x.attrib["select"] for x in tree.getroot() if "param" in x.tag}
         self.__xsldefaultparameter = self.__xslparameter
+        self.__changed()
+
+    def set_xmlrecords(self, record: Optional[str], fields: Optional[Dict[str, str]] = None, batchsize: int = 10000):
+        """set_xmlrecords switches .xml import from xsl transformation to streaming the records of flat xml files
+            record is the tag or a simple path like items/item or /root/items/item of the record elements
+            fields maps column names to xpath expressions relative to a record like name, @id or address/city
+            call with record None to go back to xsl transformation"""
+        self.__xmlrecords = (record, tuple(fields.items()), batchsize) if record else None
+        self.__changed()
+
+    def set_key(self, *columns: str):
+        """set_key switches to keyed merging, the columns identify a row and dfx holds only the newest row per key
+            files are merged in order and a file that is added or read in new because it changed replaces the rows
+            of its keys, so re-delivered corrected files don't leave duplicate or stale rows behind
+            dfx only depends on the files and the order they were delivered in, a changed file counts as delivered
+            after all others and keys it no longer has are dropped unless other files have them
+            new files and lines appended to watched files are upserted through a hash index without merging all
+            files again, a changed or removed file merges all files again, rows are updated in place so take a copy
+            of dfx to keep a snapshot, call without columns to append all rows again"""
+        self.__key = columns or None
+        self.__keyindex = None
+        self.__merged = {}
+        self.__changed()
+
+    def select(self, columns: Optional[List[str]] = None, where: Optional[str or Callable] = None,
+               filtercolumns: Optional[List[str]] = None):
+        """select restricts the import to the given columns and the rows matching where
+            where is a pandas.DataFrame.query string like "age > 30" or a function returning a boolean mask for a
+            dataframe, it sees the columns as parsed by pandas.read_csv before types are inferred and may use
+            columns that are not selected, the columns of a query string are found automatically,
+            a function gets the columns and filtercolumns, or all columns if filtercolumns is not given
+            columns are left out while parsing and rows are filtered chunk by chunk before the files are merged
+            with a process pool a function has to be defined at module level so it can be pickled, files filtered
+            by a function are not kept in the parse cache
+            call without arguments to import everything again"""
+        if columns is None and where is None:
+            self.__select = None
+            self.__changed()
+            return
+        columns = tuple(columns) if columns is not None else None
+        parsed = columns
+        if columns is not None and where is not None:
+            # the columns where needs are parsed as well and dropped once the rows are filtered
+            needed = _query_names(where) if isinstance(where, str) else filtercolumns
+            parsed = (*columns, *(column for column in needed if column not in columns)) \
+                if needed is not None else None
+        self.__select = (columns, where, parsed)
+        self.__changed()
 
     def set_xslparameter(self, **kwargs):
         """set_xslparameter set what parameter to use for the .xml -> .csv conversion
-            use get_xslparameter with default=True to identify possible parameters"""
+            use get_xslparameter with default=True to identify possible parameters
+            the files are read with the new parameters the next time the data is accessed"""
         self.__xslparameter = kwargs
+        self.__changed()
 
     def get_xslparameter(self, default=False):
         """get_xslparameter returns the default from xsl if default is set to true else currently set once"""
@@ -228,15 +2004,49 @@ class CsvXmlImporter:
         self.dfx = pd.DataFrame()
         self.__pdreadcsvsettings = {}
         self.__filenames = []
+        self.__encodings = {}
+        self.__results = {}
+        self.__resultparameters = None
+        self.__watched = {}
+        self.__keyindex = None
+        self.__merged = {}
+        self.__deliveries = {}
 
     def set_settings(self, **kwargs):
-        """applies new passed parameters and reloads files with new settings"""
+        """applies new passed parameters, the files are read with the new settings the next time the data is accessed
+            so several calls in a row only cause one reread"""
         self.__pdreadcsvsettings.update(kwargs)
-        self.update_files()
+        self.__changed()
 
     def get_settings(self):
         return self.__pdreadcsvsettings
 
+    def get_filenames(self):
+        """get_filenames returns the names of the imported files"""
+        return [*self.__filenames]
+
+    def get_encodings(self):
+        """get_encodings returns the encoding each csv file was read with by filename"""
+        return self.__encodings
+
+    def memory_report(self):
+        """memory_report returns the bytes each column of dfx takes before and after compaction
+            before is the sum over the files as parsed, after is measured on dfx"""
+        after = self.dfx.memory_usage(deep=True, index=False)
+        before = pd.Series(0, index=after.index, dtype="int64")
+        for filename in self.__filenames:
+            frame = self.__results[filename][1][0]
+            uncompacted = frame.attrs.get("uncompacted") or frame.memory_usage(deep=True, index=False).to_dict()
+            for column, size in uncompacted.items():
+                if column in before.index:
+                    before[column] += size
+        if self.__provenance:
+            before[self.__provenance] = after[self.__provenance]
+        report = pd.DataFrame({"before": before, "after": after})
+        report.loc["total"] = report.sum()
+        report["ratio"] = report["before"] / report["after"]
+        return report
+
     def to_dict(self, **kwargs):
         """to_dict syntax sugar see pandas.Dataframe.to_dict() docs for more information"""
         return self.dfx.to_dict(**kwargs)
@@ -245,6 +2055,50 @@ class CsvXmlImporter:
         """to_csv syntax sugar see pandas.Dataframe.to_csv() docs for more information"""
         return self.dfx.to_csv(**kwargs)
 
+    def to_dict_chunks(self, *filenames: str, chunksize: int = 100000, **kwargs):
+        """to_dict_chunks streaming counterpart of to_dict yielding one dict per chunk see iter_chunks"""
+        for chunk in self.iter_chunks(*filenames, chunksize=chunksize):
+            yield chunk.to_dict(**kwargs)
+
+    def to_csv_chunks(self, path_or_buf, *filenames: str, chunksize: int = 100000, **kwargs):
+        """to_csv_chunks streaming counterpart of to_csv writing chunk by chunk see iter_chunks
+            the header is written once and all chunks are aligned to the columns of the first chunk
+            files are written as utf-8 unless another encoding is passed like to_csv does"""
+        f = open(path_or_buf, "w", newline="", encoding=kwargs.pop("encoding", None) or "utf-8") \
+            if isinstance(path_or_buf, (str, Path)) else path_or_buf
+        header = kwargs.pop("header", True)
+        try:
+            columns = None
+            for chunk in self.iter_chunks(*filenames, chunksize=chunksize):
+                if columns is None:
+                    columns = chunk.columns
+                    chunk.to_csv(f, header=header, **kwargs)
+                else:
+                    chunk.reindex(columns=columns).to_csv(f, header=False, **kwargs)
+        finally:
+            if f is not path_or_buf:
+                f.close()
+
+    def validate(self, schema: Dict[str, str], *, chunksize: int = 100000, allowmissing: bool = True):
+        """validate checks the columns of dfx against the types in schema see validate_frame
+            the chunks are checked in the executor or process pool of the importer if one is configured"""
+        executor = self.__executor
+        if executor is None and self.__workers:
+            executor = ProcessPoolExecutor(self.__workers)
+        try:
+            return validate_frame(self.dfx, schema, chunksize, allowmissing, executor)
+        finally:
+            if executor is not None and executor is not self.__executor:
+                executor.shutdown()
+
+    def export(self, path, format: Optional[str] = None, *, chunksize: int = 100000, compression: Optional[str] = None,
+               **kwargs):
+        """export writes dfx to a csv, parquet or feather file chunk by chunk see export_frame
+            progress and cancel of the importer are used unless others are passed"""
+        kwargs.setdefault("progress", self.__progress)
+        kwargs.setdefault("cancel", self.__cancel)
+        export_frame(self.dfx, path, format, chunksize=chunksize, compression=compression, **kwargs)
+
     def to_numpy(self, **kwargs):
         """to_numpy syntax sugar see pandas.Dataframe.to_numpy() docs for more information"""
         return self.dfx.to_numpy(**kwargs)
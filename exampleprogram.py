@@ -1,16 +1,19 @@
 from codecs import escape_decode
 from io import StringIO
+from queue import Queue, Empty
+from threading import Event, Thread
 from tkinter import Menu, Listbox, Text, StringVar, BooleanVar, IntVar
 from tkinter.constants import E, W, X, END
 from tkinter.filedialog import askopenfilename, askopenfilenames, asksaveasfilename
 from tkinter.messagebox import showerror, showinfo
-from tkinter.ttk import Combobox, Frame, LabelFrame, Button, Label, Radiobutton, Checkbutton, Entry, Scrollbar
+from tkinter.ttk import Combobox, Frame, LabelFrame, Button, Label, Radiobutton, Checkbutton, Entry, Scrollbar, \
+    Progressbar
 
 from pandas import DataFrame
 from pandastable import Table, TableModel
 from ttkthemes import ThemedTk
 
-from csvxmlimporter import CsvXmlImporter
+from csvxmlimporter import CsvXmlImporter, ImportCancelled, XslFileMissing, export_frame
 
 # list of encodings that can be detected by chardet
 encodings = (
@@ -22,6 +25,22 @@ encodings = (
 # theme to use for the interface
 theme = "equilux"
 
+# milliseconds to wait for further settings changes before the files are read in new
+settingsdelay = 300
+
+# milliseconds between two checks for messages of the import worker
+pollinterval = 50
+
+# export formats and the compressions their writers support, the first one is the default
+exportcompressions = {
+    "csv": [],
+    "parquet": ["snappy", "zstd", "gzip", "brotli", "lz4", "none"],
+    "feather": ["lz4", "zstd", "uncompressed"],
+}
+
+# rows shown at once in the preview, only this many rows are handed to the table
+pagesize = 1000
+
 
 class Program:
     """Exampleprogram to show possible usage of the module csvxmlImporter"""
@@ -31,7 +50,17 @@ class Program:
     def __init__(self):
         """__init__ creates the tkinter gui"""
         self.__settings = {}
-        self.__importer = CsvXmlImporter()
+        # the importer is only used by the worker thread, the gui talks to it through the two queues
+        self.__cancel = Event()
+        self.__requests = Queue()
+        self.__messages = Queue()
+        self.__generation = 0
+        self.__running = 0
+        self.__reading = False
+        self.__importer = CsvXmlImporter(progress=self.__report_progress, cancel=self.__cancel)
+        self.__dfx = DataFrame()
+        self.__page = 0
+        Thread(target=self.__work, daemon=True).start()
 
         # ***--*** main window and menu band ***---***
         self.__root = ThemedTk(theme=theme)
@@ -161,10 +190,26 @@ class Program:
 
         # ***---*** preview frame ***---***
         previewframe = LabelFrame(self.__root, text="Preview")
-        self.__pdtable = Table(parent=previewframe, dataframe=self.__importer.dfx)
+        self.__pdtable = Table(parent=previewframe, dataframe=self.__dfx)
         self.__pdtable.show()
+        pageframe = Frame(previewframe)
+        Button(pageframe, text="<", width=3, command=lambda: self.show_page(self.__page - 1)).pack(side="left")
+        self.__pagelabel = StringVar(value="")
+        Label(pageframe, textvariable=self.__pagelabel, width=30, anchor="center").pack(side="left")
+        Button(pageframe, text=">", width=3, command=lambda: self.show_page(self.__page + 1)).pack(side="left")
+        pageframe.grid(column=0, row=3, columnspan=3)
         previewframe.pack(fill="both", expand=True)
 
+        # ***---*** progress of the import worker ***---***
+        progressframe = Frame(self.__root)
+        self.__progress = Progressbar(progressframe, mode="determinate")
+        self.__progress.pack(side="left", fill=X, expand=True, padx=5)
+        self.__status = StringVar(value="Ready")
+        Label(progressframe, textvariable=self.__status, width=40).pack(side="left", padx=5)
+        self.__cancelbutton = Button(progressframe, text="Cancel", command=self.cancel, state="disabled")
+        self.__cancelbutton.pack(side="left")
+        progressframe.pack(fill=X)
+
         # ***---*** export button ***---***
         exportframe = LabelFrame(self.__root, text="Export")
         Button(exportframe, text="Export", command=self.create_exportdialog).pack()
@@ -172,6 +217,10 @@ class Program:
 
         # save settings to check for changes on update
         self.__prevsettings = self.__unpack_settings(self.__settings)
+        self.__settingsjob = None
+        self.__changedsettings = {}
+        self.__xsldefaultparameter = {}
+        self.__root.after(pollinterval, self.__poll)
 
     def run(self):
         """run starts the mainloop of tkinter gui"""
@@ -179,8 +228,100 @@ class Program:
 
     def exit(self):
         """exit closes tkinter application"""
+        self.__cancel.set()
         self.__root.destroy()
 
+    def cancel(self):
+        """cancel called by user to stop reading the remaining files of the running import"""
+        self.__cancel.set()
+        self.__status.set("Cancelling...")
+
+    def __submit(self, job, description, added=()):
+        """__submit hands a change of the importer to the worker thread
+            added are files the change adds, their preview is shown before they are read
+            a running read of the files is cancelled as its result would be replaced by this one anyway
+            a running change like adding files is finished first so it isn't lost"""
+        self.__generation += 1
+        if self.__reading:
+            self.__cancel.set()
+        self.__requests.put((self.__generation, job, added))
+        self.__progress["value"] = 0
+        self.__status.set(description)
+        self.__cancelbutton["state"] = "normal"
+
+    def __work(self):
+        """__work runs in the worker thread, applies every change in order and reads the files of the newest one
+            changes are never skipped so the importer ends up in the state the user asked for
+            the first rows are parsed and sent ahead so the preview shows up before the files are read completely"""
+        while True:
+            generation, job, added = self.__requests.get()
+            self.__running = generation
+            self.__cancel.clear()
+            try:
+                # added files are read while adding them, so their preview has to come first
+                if added and generation == self.__generation:
+                    preview = self.__importer.preview(*self.__importer.get_filenames(), *added, rows=pagesize)
+                    self.__messages.put(("preview", generation, preview))
+                job(self.__importer)
+                # a newer change is queued, reading the files now would only produce a stale result
+                if generation == self.__generation:
+                    if not added:
+                        self.__messages.put(("preview", generation, self.__importer.preview(rows=pagesize)))
+                    self.__reading = True
+                    dfx = self.__importer.dfx
+                    self.__messages.put(("done", generation, dfx))
+            except ImportCancelled:
+                self.__messages.put(("cancelled", generation, None))
+            except XslFileMissing:
+                self.__messages.put(("error", generation, "No .xsl file set"))
+            except ValueError as e:
+                self.__messages.put(("error", generation, f"Could not open files\n{e}"))
+            except Exception as e:
+                # the worker thread has to survive any error, otherwise every later change would wait forever
+                self.__messages.put(("error", generation, f"Could not open files\n{type(e).__name__}: {e}"))
+            finally:
+                self.__reading = False
+            self.__messages.put(("state", generation,
+                                 (self.__importer.get_filenames(), self.__importer.get_settings())))
+
+    def __report_progress(self, filename, done, total):
+        """__report_progress is called by the importer in the worker thread after every file"""
+        self.__messages.put(("progress", self.__running, (filename, done, total)))
+
+    def __poll(self):
+        """__poll applies the messages of the worker thread to the gui, messages of superseded changes are dropped"""
+        try:
+            while True:
+                kind, generation, content = self.__messages.get_nowait()
+                if generation != self.__generation:
+                    continue
+                elif kind == "state":
+                    # the files and settings reflect the importer after the newest change
+                    self.__update_files(content[0])
+                    self.__update_dialog(content[1])
+                    self.__cancelbutton["state"] = "disabled"
+                elif kind == "progress":
+                    filename, done, total = content
+                    self.__progress["value"] = 100 * done / total
+                    self.__status.set(f"Read {done} of {total} files")
+                elif kind == "preview":
+                    self.__pagelabel.set(f"First {len(content)} rows, reading...")
+                    self.__show_frame(content)
+                elif kind == "done":
+                    self.__dfx = content
+                    self.__progress["value"] = 100
+                    self.__status.set(f"{len(content)} rows")
+                    self.show_page(0)
+                elif kind == "cancelled":
+                    self.__status.set("Cancelled, only the first rows are shown")
+                    self.__pagelabel.set("Preview")
+                elif kind == "error":
+                    self.__status.set("Error")
+                    showerror(title="Error", message=content)
+        except Empty:
+            pass
+        self.__root.after(pollinterval, self.__poll)
+
     def add_files(self):
         """add_files called by user to add files via dialog"""
         names = askopenfilenames(
@@ -188,37 +329,26 @@ class Program:
             filetypes=(("any", "*.*"), ("Csv File", "*.csv"), ("Xml File", "*.xml"))
         )
         if names:
-            try:
-                self.__srcfileslistbox.insert(END, *names)
-                self.__importer.update_files(*self.__srcfileslistbox.get(0, END))
-            except AttributeError as e:
-                showerror(title="Error", message="No .xsl file set")
-            except ValueError as _:
-                showerror(title="Error", message="Could not open files")
-                self.__srcfileslistbox.delete(0, END)
-
-            self.__update_table()
-            self.__update_dialog()
+            self.__submit(lambda importer: importer.add_files(*names), f"Adding {len(names)} files", names)
 
     def remove_files(self):
         """remove_files called by user to remove in listbox selected files"""
         itemstodelete = self.__srcfileslistbox.curselection()
         if itemstodelete:
-            for i in itemstodelete:
+            names = [self.__srcfileslistbox.get(i) for i in itemstodelete]
+            # delete from the back so the remaining indices stay valid
+            for i in reversed(itemstodelete):
                 self.__srcfileslistbox.delete(i)
 
-            x = self.__srcfileslistbox.get(0, END)
-            if x:
-                self.__importer.update_files(*x)
+            if self.__srcfileslistbox.size():
+                self.__submit(lambda importer: importer.remove_files(*names), f"Removing {len(names)} files")
             else:
-                self.__importer.reset()
-            self.__update_table()
+                self.remove_all()
 
     def remove_all(self):
         """remove_all called by user to remove all imported files"""
         self.__srcfileslistbox.delete(0, END)
-        self.__importer.reset()
-        self.__update_table()
+        self.__submit(lambda importer: importer.reset(), "Removing all files")
 
     def add_xslfile(self):
         """add_xslfile called to open .xsl file via dialog"""
@@ -227,8 +357,12 @@ class Program:
             filetypes=(("Xsl File", "*.xsl"),)
         )
         if filename:
-            self.__importer.set_xslfile(filename)
+            # the stylesheet is parsed right away to show its parameters, the files are read in the background
+            importer = CsvXmlImporter()
+            importer.set_xslfile(filename)
+            self.__submit(lambda importer: importer.set_xslfile(filename), "Applying xsl file")
             self.__xsllistbox.insert(0, filename)
+            self.__xsldefaultparameter = importer.get_xslparameter(default=True)
             self.reset_xslparameter()
 
     def apply_xslparameter(self):
@@ -238,15 +372,12 @@ class Program:
             lines = [line[:-1] for line in f.readlines()]
             # escape_decode removes extra escapes added through reading the text
             d = {x.split("=")[0]: escape_decode(x.split("=")[1])[0] for x in lines if x}
-            self.__importer.set_xslparameter(**d)
-        if not self.__importer.dfx.empty:
-            self.__importer.update_files()
-            self.__update_table()
+        self.__submit(lambda importer: importer.set_xslparameter(**d), "Applying xsl parameter")
 
     def reset_xslparameter(self):
         """reset_xslparameter restores default values for xslparameters"""
         self.__xslparametertext.delete("1.0", END)
-        param = self.__importer.get_xslparameter(default=True)
+        param = self.__xsldefaultparameter
         s = ""
         for key, item in param.items():
             s += repr(key + "=" + item)[1:-1] + '\n'
@@ -257,17 +388,36 @@ class Program:
         """__unpack_settings takes settings in form of dict with tkinter variables and unpacks them"""
         return dict((key, settings[key].get()) for key in settings)
 
-    def __update_table(self):
-        """__update_table updates pandastable to display the actual dataframe"""
-        self.__pdtable.updateModel(TableModel(self.__importer.dfx))
+    def show_page(self, page):
+        """show_page shows the rows of the given page of the imported dataframe in the table"""
+        pages = max(1, -(-len(self.__dfx) // pagesize))
+        self.__page = min(max(page, 0), pages - 1)
+        self.__pagelabel.set(f"Page {self.__page + 1} of {pages}")
+        self.__show_frame(self.__dfx.iloc[self.__page * pagesize:(self.__page + 1) * pagesize])
+
+    def __show_frame(self, frame):
+        """__show_frame updates pandastable to display the given rows"""
+        self.__pdtable.updateModel(TableModel(frame))
         self.__pdtable.redraw()
 
-    def __update_dialog(self):
+    def __update_files(self, filenames):
+        """__update_files shows the files of the importer in the listbox"""
+        if [*self.__srcfileslistbox.get(0, END)] != filenames:
+            self.__srcfileslistbox.delete(0, END)
+            if filenames:
+                self.__srcfileslistbox.insert(END, *filenames)
+
+    def __update_dialog(self, importersettings):
         """__update_dialog updates the input fields with settings from the importer"""
-        importersettings = self.__importer.get_settings()
-        for key in self.__settings:
-            if key in importersettings:
-                self.__settings[key].set(importersettings[key])
+        changed = {
+            key: importersettings[key] for key in self.__settings
+            if key in importersettings and key not in self.__changedsettings
+            and importersettings[key] != self.__prevsettings.get(key)
+        }
+        # update the previous settings first so the traces of the variables don't apply them again
+        self.__prevsettings.update(changed)
+        for key, value in changed.items():
+            self.__settings[key].set(value)
 
     def update_settings(self, *_):
         """update_settings reads input fields and applies the user input to the importer"""
@@ -276,10 +426,18 @@ class Program:
             # figure out which settings changed
             changedsettings = dict(newsettings.items() - self.__prevsettings.items())
 
-            self.__importer.set_settings(**changedsettings)
+            # changes are collected until the user paused and then read in one pass
+            self.__changedsettings.update(changedsettings)
             self.__prevsettings = newsettings
-            if not self.__importer.dfx.empty:
-                self.__update_table()
+            if self.__settingsjob is not None:
+                self.__root.after_cancel(self.__settingsjob)
+            self.__settingsjob = self.__root.after(settingsdelay, self.__apply_settings)
+
+    def __apply_settings(self):
+        """__apply_settings hands the collected settings to the worker thread"""
+        self.__settingsjob = None
+        settings, self.__changedsettings = self.__changedsettings, {}
+        self.__submit(lambda importer: importer.set_settings(**settings), "Applying settings")
 
     def ask_help(self):
         showinfo(title="Help",
@@ -296,29 +454,51 @@ class Program:
                  )
 
     def create_exportdialog(self):
-        ExportDialog(self.__importer.dfx).run()
+        ExportDialog(self.__dfx).run()
 
 
 class ExportDialog:
-    """ExportDialog provides a window to save a dataframe to csv file with custom settings"""
+    """ExportDialog provides a window to save a dataframe to a csv, parquet or feather file with custom settings
+        the file is written chunk by chunk in a background thread that can be cancelled"""
 
     def __init__(self, df: DataFrame):
         self.__root = ThemedTk(theme=theme)
         self.__root.title("Export")
         self.__df = df
+        self.__cancel = Event()
+        self.__messages = Queue()
+        self.__thread = None
 
         frame = Frame(self.__root)
+        Label(frame, text="Format").grid(column=1, row=0)
+        self.__format = StringVar(self.__root, value="csv")
+        self.__format.trace_add("write", self.update_format)
+        Combobox(frame, textvariable=self.__format, values=[*exportcompressions],
+                 state="readonly").grid(column=2, row=0)
+
         Label(frame, text="Seperator").grid(column=1, row=1)
         self.__separator = StringVar(self.__root, value=",")
-        Entry(frame, textvariable=self.__separator).grid(column=2, row=1)
+        self.__separatorentry = Entry(frame, textvariable=self.__separator)
+        self.__separatorentry.grid(column=2, row=1)
 
         Label(frame, text="Encoding").grid(column=1, row=2)
         self.__encoding = StringVar(self.__root, value="UTF-8")
-        Combobox(frame, textvariable=self.__encoding, values=encodings, state="readonly").grid(column=2, row=2)
+        self.__encodingbox = Combobox(frame, textvariable=self.__encoding, values=encodings, state="readonly")
+        self.__encodingbox.grid(column=2, row=2)
+
+        Label(frame, text="Compression").grid(column=1, row=3)
+        self.__compression = StringVar(self.__root, value="")
+        self.__compressionbox = Combobox(frame, textvariable=self.__compression, state="disabled")
+        self.__compressionbox.grid(column=2, row=3)
         frame.pack(fill="both", expand=True)
 
         frame = Frame(self.__root)
-        Button(frame, text="Save", command=self.export_csv).pack()
+        self.__progress = Progressbar(frame, mode="determinate")
+        self.__progress.pack(fill=X, padx=5)
+        self.__savebutton = Button(frame, text="Save", command=self.export)
+        self.__savebutton.pack(side="left", expand=True)
+        self.__cancelbutton = Button(frame, text="Cancel", command=self.cancel)
+        self.__cancelbutton.pack(side="left", expand=True)
         frame.pack(fill="both", expand=True)
 
     def run(self):
@@ -327,18 +507,75 @@ class ExportDialog:
     def exit(self):
         self.__root.destroy()
 
-    def export_csv(self):
-        e = self.__encoding.get()
-        s = self.__separator.get()
-        destination = asksaveasfilename(defaultextension=".csv", filetypes=(("Csv File", "*.csv"),),
-                                        initialfile="export.csv")
+    def cancel(self):
+        """cancel stops a running export and leaves no file behind, without a running export the dialog is closed"""
+        if self.__thread is not None:
+            self.__cancel.set()
+        else:
+            self.exit()
+
+    def update_format(self, *_):
+        """update_format enables the settings that apply to the selected format"""
+        compressions = exportcompressions[self.__format.get()]
+        self.__separatorentry["state"] = "normal" if not compressions else "disabled"
+        self.__encodingbox["state"] = "readonly" if not compressions else "disabled"
+        self.__compressionbox["values"] = compressions
+        self.__compressionbox["state"] = "readonly" if compressions else "disabled"
+        self.__compression.set(compressions[0] if compressions else "")
+
+    def export(self):
+        """export asks for the destination and starts writing the file in the background"""
+        format = self.__format.get()
+        extension = {"csv": ".csv", "parquet": ".parquet", "feather": ".feather"}[format]
+        destination = asksaveasfilename(defaultextension=extension, filetypes=((format, "*" + extension),),
+                                        initialfile="export" + extension)
         if destination:
-            try:
-                self.__df.to_csv(destination, sep=s, encoding=e)
-            except ValueError:
-                showerror(text="Oops. Something went wrong. Please try again.")
-            finally:
-                self.exit()
+            if format == "csv":
+                settings = dict(sep=self.__separator.get(), encoding=self.__encoding.get())
+            else:
+                settings = dict(compression=self.__compression.get())
+            self.__savebutton["state"] = "disabled"
+            self.__thread = Thread(target=self.__work, args=(destination, format, settings), daemon=True)
+            self.__thread.start()
+            self.__root.after(pollinterval, self.__poll)
+
+    def __work(self, destination, format, settings):
+        """__work runs in the export thread and reports progress and the outcome through the message queue"""
+        try:
+            export_frame(self.__df, destination, format, cancel=self.__cancel,
+                         progress=lambda path, done, total: self.__messages.put(("progress", done, total)),
+                         **settings)
+            self.__messages.put(("done", None, None))
+        except ImportCancelled:
+            self.__messages.put(("cancelled", None, None))
+        except (ValueError, OSError, ImportError) as e:
+            self.__messages.put(("error", str(e), None))
+        except Exception as e:
+            # the dialog waits for a message, so the export thread has to report any error
+            self.__messages.put(("error", f"{type(e).__name__}: {e}", None))
+
+    def __poll(self):
+        """__poll applies the messages of the export thread to the dialog"""
+        try:
+            while True:
+                kind, first, second = self.__messages.get_nowait()
+                if kind == "progress":
+                    self.__progress["value"] = 100 * first / max(second, 1)
+                    continue
+                self.__thread = None
+                if kind == "done":
+                    self.exit()
+                elif kind == "cancelled":
+                    self.__progress["value"] = 0
+                    self.__cancel.clear()
+                    self.__savebutton["state"] = "normal"
+                else:
+                    showerror(title="Error", message=f"Oops. Something went wrong. Please try again.\n{first}")
+                    self.__savebutton["state"] = "normal"
+                return
+        except Empty:
+            pass
+        self.__root.after(pollinterval, self.__poll)
 
 
 if __name__ == "__main__":
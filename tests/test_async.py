@@ -0,0 +1,53 @@
+"""tests of the asyncio api"""
+import asyncio
+
+import pandas as pd
+import pytest
+
+from csvxmlimporter import CsvXmlImporter
+
+
+def write(path, text):
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        f.write(text)
+    return str(path)
+
+
+@pytest.fixture
+def files(tmp_path):
+    return [write(tmp_path / f"{i}.csv", "id,amount\n" + "".join(f"{j},{j * 10}\n" for j in range(i * 5, i * 5 + 5)))
+            for i in range(6)]
+
+
+@pytest.mark.parametrize("options", [{}, {"key": "id", "provenance": "source"}, {"workers": 2}])
+def test_aupdate_files_equals_update_files(files, options):
+    expected = CsvXmlImporter(files, **options).dfx
+    importer = CsvXmlImporter(**options)
+    dfx = asyncio.run(importer.aupdate_files(*files, concurrency=3))
+    pd.testing.assert_frame_equal(dfx, expected)
+    pd.testing.assert_frame_equal(importer.dfx, expected)
+    assert importer.get_filenames() == files
+
+
+def test_aiter_files_yields_every_file_once(files):
+    async def collect(importer):
+        return {filename: frame async for filename, frame in importer.aiter_files(*files, concurrency=2)}
+
+    importer = CsvXmlImporter()
+    frames = asyncio.run(collect(importer))
+    assert sorted(frames) == sorted(files)
+    assert all(frame["id"].tolist() == [*range(i * 5, i * 5 + 5)] for i, frame in enumerate(map(frames.get, files)))
+    assert importer.get_filenames() == [] and importer.dfx.empty
+
+
+@pytest.mark.parametrize("broken", ["missing.csv", "unterminated.csv"])
+def test_failing_file_leaves_the_importer_unchanged(tmp_path, files, broken):
+    importer = CsvXmlImporter(files[:2])
+    before = importer.dfx.copy()
+    filename = str(tmp_path / broken)
+    if broken == "unterminated.csv":
+        write(filename, 'id,amount\n1,"unterminated\n')
+    with pytest.raises(ValueError, match=broken):
+        asyncio.run(importer.aupdate_files(*files, filename))
+    assert importer.get_filenames() == files[:2]
+    pd.testing.assert_frame_equal(importer.dfx, before)
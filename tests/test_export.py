@@ -0,0 +1,65 @@
+"""tests of writing dfx to csv, parquet and feather files"""
+import pandas as pd
+import pytest
+
+import csvxmlimporter
+from csvxmlimporter import CsvXmlImporter, export_frame
+
+
+def write(path, text):
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        f.write(text)
+    return str(path)
+
+
+@pytest.fixture
+def mixed(tmp_path):
+    """mixed returns an importer whose column v holds numbers from one file and text from the other"""
+    return CsvXmlImporter([
+        write(tmp_path / "numbers.csv", "id,v\n1,10\n2,20\n"),
+        write(tmp_path / "text.csv", "id,v\n3,abc\n4,\n"),
+    ])
+
+
+@pytest.mark.parametrize("extension", [".parquet", ".feather"])
+@pytest.mark.parametrize("compression", [None, "zstd", "lz4"])
+def test_mixed_columns_are_written_as_strings(tmp_path, mixed, extension, compression):
+    pytest.importorskip("pyarrow")
+    path = tmp_path / f"out{extension}"
+    mixed.export(path, compression=compression, chunksize=3)
+    frame = pd.read_parquet(path) if extension == ".parquet" else pd.read_feather(path)
+    assert frame["v"].tolist()[:3] == ["10", "20", "abc"]
+    assert pd.isna(frame["v"].iloc[3])
+    assert frame["id"].tolist() == [1, 2, 3, 4]
+
+
+def test_column_missing_in_first_chunk_gets_its_type(tmp_path):
+    pytest.importorskip("pyarrow")
+    frame = pd.DataFrame({"v": pd.Series([None, None, 1, "x"], dtype=object), "n": [None, None, 1.5, 2.5]})
+    export_frame(frame, tmp_path / "out.parquet", chunksize=2)
+    written = pd.read_parquet(tmp_path / "out.parquet")
+    assert written["v"].tolist()[2:] == ["1", "x"]
+    assert written["n"].tolist()[2:] == [1.5, 2.5]
+
+
+def test_unknown_format_leaves_no_file(tmp_path, mixed):
+    with pytest.raises(ValueError):
+        mixed.export(tmp_path / "out.txt")
+    assert [*tmp_path.glob("out*")] == []
+
+
+def test_csv_is_utf8_by_default(tmp_path, monkeypatch):
+    encodings = []
+
+    def spy(file, mode="r", *args, encoding=None, **kwargs):
+        """spy records the encoding text files are written with, without it the locale would decide"""
+        if "w" in mode:
+            encodings.append(encoding)
+        return open(file, mode, *args, encoding=encoding, **kwargs)
+
+    importer = CsvXmlImporter([write(tmp_path / "in.csv", "id,name\n1,Jürgen\n2,Zoë\n")])
+    monkeypatch.setattr(csvxmlimporter, "open", spy, raising=False)
+    importer.export(tmp_path / "out.csv", index=False)
+    importer.to_csv_chunks(tmp_path / "chunks.csv", index=False)
+    assert encodings == ["utf-8", "utf-8"]
+    assert (tmp_path / "out.csv").read_bytes() == importer.to_csv(index=False).encode("utf-8")
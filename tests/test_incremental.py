@@ -0,0 +1,203 @@
+"""regression tests checking that incremental imports end up with the same dfx as importing from scratch"""
+import os
+import pickle
+from io import StringIO
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from csvxmlimporter import CsvXmlImporter, ParseCache
+
+
+def write(path, content, mode="w"):
+    with open(path, mode) if "b" in mode else open(path, mode, encoding="utf-8", newline="") as f:
+        f.write(content)
+    return str(path)
+
+
+def touch(path, offset):
+    """touch moves the modification time so a rewrite within the same clock tick is noticed"""
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + offset))
+
+
+@pytest.fixture
+def files(tmp_path):
+    return [
+        write(tmp_path / "a.csv", "id,amount\n1,10\n2,20\n3,30\n"),
+        write(tmp_path / "b.csv", "id,amount\n,40\n4,50\n2,60\n"),
+        write(tmp_path / "c.csv", "id,amount\n,70\n5,80\n1,90\n"),
+    ]
+
+
+@pytest.mark.parametrize("provenance", [None, "source"])
+def test_keyed_add_files_equals_scratch(files, provenance):
+    incremental = CsvXmlImporter(files[:1], key="id", provenance=provenance)
+    for filename in files[1:]:
+        incremental.add_files(filename)
+    scratch = CsvXmlImporter(files, key="id", provenance=provenance)
+    pd.testing.assert_frame_equal(incremental.dfx, scratch.dfx)
+    assert incremental.dfx["id"].isna().sum() == 1
+
+
+def test_keyed_changed_file_equals_scratch(files):
+    incremental = CsvXmlImporter(files, key="id")
+    incremental.dfx
+    # a changed file counts as delivered after all other files and keys it no longer has are dropped
+    write(files[1], "id,amount\n4,55\n6,66\n")
+    touch(files[1], 1000)
+    incremental.update_files()
+    scratch = CsvXmlImporter([files[0], files[2], files[1]], key="id")
+    pd.testing.assert_frame_equal(incremental.dfx, scratch.dfx)
+
+
+@pytest.mark.parametrize("provenance", [None, "source"])
+def test_keyed_rebuild_keeps_changed_file(tmp_path, provenance):
+    a = write(tmp_path / "a.csv", "id,amount\n1,10\n2,20\n")
+    b = write(tmp_path / "b.csv", "id,amount\n2,200\n3,30\n")
+    c = write(tmp_path / "c.csv", "id,amount\n2,300\n")
+    d = write(tmp_path / "d.csv", "id,amount\n9,90\n")
+    importer = CsvXmlImporter([a, b, c], key="id", provenance=provenance)
+    importer.dfx
+    write(b, "id,amount\n2,250\n")
+    touch(b, 1000)
+    importer.update_files()
+    changed = importer.dfx.copy()
+    assert changed.set_index("id")["amount"].to_dict() == {1: 10, 2: 250}
+    # adding and removing a file merges all files again, which must not undo the change of b
+    importer.add_files(d)
+    importer.remove_files(d)
+    pd.testing.assert_frame_equal(importer.dfx, changed)
+
+
+def sort_rows(frame):
+    """sort_rows orders the rows by all columns, watch mode appends new lines at the end instead of in file order"""
+    return frame.sort_values([*frame.columns], na_position="first").reset_index(drop=True)
+
+
+@pytest.mark.parametrize("key", [None, "id"])
+def test_poll_appended_lines_equals_scratch(tmp_path, files, key):
+    watcher = CsvXmlImporter(key=key)
+    watcher.poll_files(str(tmp_path))
+    write(files[0], "6,100\n", "a")
+    write(files[2], "7,120\n,130\n", "a")
+    delta, replaced = watcher.poll_files(str(tmp_path))
+    assert replaced == []
+    assert len(delta) == 3
+    scratch = CsvXmlImporter(sorted(files), key=key)
+    pd.testing.assert_frame_equal(sort_rows(watcher.dfx), sort_rows(scratch.dfx))
+
+
+def test_poll_keeps_split_characters(tmp_path):
+    filename = write(tmp_path / "log.csv", "id,amount,name\n1,10,Anna\n2,20,Bob\n")
+    watcher = CsvXmlImporter()
+    watcher.poll_files(str(tmp_path))
+    # an ascii file gets utf-8 text appended, a character split over two writes has to wait for its second half
+    appended = "3,30,Jürgen\n4,40,Zoë €\n".encode("utf-8")
+    write(filename, appended[:-3], "ab")
+    first, _ = watcher.poll_files(str(tmp_path))
+    write(filename, appended[-3:], "ab")
+    second, _ = watcher.poll_files(str(tmp_path))
+    assert len(first) + len(second) == 2
+    pd.testing.assert_frame_equal(watcher.dfx, CsvXmlImporter([filename]).dfx)
+
+
+def test_poll_failure_does_not_lose_lines(tmp_path):
+    filename = write(tmp_path / "log.csv", "id,amount\n1,10\n2,20\n")
+    watcher = CsvXmlImporter()
+    watcher.poll_files(str(tmp_path))
+    write(filename, b"3,\xff\n", "ab")
+    for _ in range(2):
+        with pytest.raises(ValueError, match="log.csv"):
+            watcher.poll_files(str(tmp_path))
+    assert len(watcher.dfx) == 2
+
+
+@pytest.mark.parametrize("header", [True, False])
+def test_csv_chunks_equal_to_csv(files, header):
+    # the first file has no missing values so every chunk gets the dtypes of the whole file
+    importer = CsvXmlImporter(files[:1])
+    chunked = StringIO()
+    importer.to_csv_chunks(chunked, chunksize=2, header=header, index=False)
+    assert chunked.getvalue() == importer.to_csv(header=header, index=False)
+
+
+def test_poll_file_without_rows_keeps_dtypes(tmp_path, files):
+    log = write(tmp_path / "log.csv", "id,amount\n")
+    watcher = CsvXmlImporter(provenance="source")
+    watcher.poll_files(str(tmp_path))
+    # a rewritten file merges all files again while the log has no rows yet
+    write(files[0], "id,amount\n1,11\n")
+    touch(files[0], 1000)
+    watcher.poll_files(str(tmp_path))
+    assert watcher.dfx.columns[-1] == "source"
+    write(log, "7,70\n8,80\n", "a")
+    watcher.poll_files(str(tmp_path))
+    scratch = CsvXmlImporter(sorted([*files, log]), provenance="source")
+    pd.testing.assert_frame_equal(sort_rows(watcher.dfx), sort_rows(scratch.dfx), check_categorical=False)
+
+
+@pytest.mark.parametrize("detectsamples", [0, 4])
+def test_encoding_outside_the_samples(tmp_path, detectsamples):
+    lines = "".join(f"{i},name{i}\n" for i in range(20000)) + "20000,Jürgen\n" + "".join(
+        f"{i},name{i}\n" for i in range(20001, 20100))
+    filename = write(tmp_path / "latin.csv", ("id,name\n" + lines).encode("cp1252"), "wb")
+    importer = CsvXmlImporter([filename], detectsamples=detectsamples)
+    assert importer.dfx["name"].iloc[20000] == "Jürgen"
+    assert importer.get_encodings()[filename].lower() in ("windows-1252", "iso-8859-1")
+
+
+def test_broken_cache_entry_is_parsed_again(tmp_path, files):
+    cache = ParseCache(tmp_path / "cache")
+    expected = CsvXmlImporter(files, cache=cache).dfx
+    entries = [*cache.directory.glob("*.feather")]
+    assert len(entries) == len(files)
+    for entry in entries:
+        entry.write_bytes(b"truncated")
+    pd.testing.assert_frame_equal(CsvXmlImporter(files, cache=cache).dfx, expected)
+
+
+def test_cache_pickles_only_frames_feather_can_not_store(tmp_path):
+    cache = ParseCache(tmp_path / "cache")
+    mixed = pd.DataFrame({"id": [1, 2], "value": [1, "x"]})
+    plain = pd.DataFrame({"id": [1, 2], "name": pd.Series(["a", np.nan], dtype=object)}, index=[3, 5])
+    cache.put("mixed", (mixed, "utf-8"))
+    cache.put("plain", (plain, None))
+    assert sorted(path.name for path in cache.directory.iterdir()) == ["mixed.pkl", "plain.feather"]
+    frame, encoding = cache.get("mixed")
+    pd.testing.assert_frame_equal(frame, mixed)
+    assert encoding == "utf-8"
+    frame, encoding = cache.get("plain")
+    pd.testing.assert_frame_equal(frame, plain)
+    assert encoding is None
+    # a pickle referring to a name that does not exist like one written by another pandas version
+    (cache.directory / "mixed.pkl").write_bytes(pickle.dumps(os.path.join).replace(b"join", b"jxin"))
+    assert cache.get("mixed") is None
+    assert not (cache.directory / "mixed.pkl").exists()
+
+
+def test_rows_selected_by_function_are_not_cached(tmp_path, files):
+    cache = ParseCache(tmp_path / "cache")
+    importer = CsvXmlImporter(cache=cache)
+    importer.select(["amount"], lambda frame: frame["id"] > 1, filtercolumns=["id"])
+    importer.update_files(*files)
+    assert importer.dfx["amount"].tolist() == [20, 30, 50, 60, 80]
+    assert [*cache.directory.iterdir()] == []
+
+
+def test_poll_rebuild_keeps_appended_lines_last(tmp_path, files):
+    watcher = CsvXmlImporter(key="id")
+    watcher.poll_files(str(tmp_path))
+    # the appended line is newer than the rows of the later files
+    write(files[0], "2,999\n", "a")
+    watcher.poll_files(str(tmp_path))
+    appended = watcher.dfx.copy()
+    assert appended.set_index("id")["amount"][2] == 999
+    # a rewritten file merges all files again, which must keep the appended line last
+    write(files[2], open(files[2]).read().replace("5,80", "5,81"))
+    touch(files[2], 1000)
+    delta, replaced = watcher.poll_files(str(tmp_path))
+    assert replaced == [files[2]]
+    appended.loc[appended["id"] == 5, "amount"] = 81
+    pd.testing.assert_frame_equal(watcher.dfx, appended)
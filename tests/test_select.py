@@ -0,0 +1,89 @@
+"""tests of restricting the import to some columns and rows with select"""
+import pytest
+
+from csvxmlimporter import CsvXmlImporter
+
+
+def write(path, text):
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        f.write(text)
+    return str(path)
+
+
+@pytest.fixture
+def people(tmp_path):
+    return write(tmp_path / "people.csv", "id,name,age,city\n1,Anna,35,Berlin\n2,Bob,25,Bonn\n3,Carl,40,Köln\n")
+
+
+@pytest.mark.parametrize("engine", [None, "python", "pyarrow"])
+def test_query_on_a_column_that_is_not_selected(people, engine):
+    if engine == "pyarrow":
+        pytest.importorskip("pyarrow")
+    importer = CsvXmlImporter(**({"engine": engine} if engine else {}))
+    importer.select(["name"], "age > 30 and city != 'Bonn'")
+    importer.update_files(people)
+    assert importer.dfx.to_dict("list") == {"name": ["Anna", "Carl"]}
+
+
+def test_query_with_backquoted_column(tmp_path):
+    filename = write(tmp_path / "spaces.csv", "id,first name,amount\n1,Anna,10\n2,Bob,20\n")
+    importer = CsvXmlImporter()
+    importer.select(["amount"], "`first name` == 'Bob'")
+    importer.update_files(filename)
+    assert importer.dfx.to_dict("list") == {"amount": [20]}
+
+
+def test_function_sees_filtercolumns_only(people):
+    seen = []
+
+    def older(frame):
+        seen.append([*frame.columns])
+        return frame["age"] > 30
+
+    importer = CsvXmlImporter()
+    importer.select(["name"], older, filtercolumns=["age"])
+    importer.update_files(people)
+    assert importer.dfx.to_dict("list") == {"name": ["Anna", "Carl"]}
+    assert seen == [["name", "age"]]
+
+
+def test_function_without_filtercolumns_sees_all_columns(people):
+    importer = CsvXmlImporter()
+    importer.select(["name"], lambda frame: frame["city"].str.startswith("B"))
+    importer.update_files(people)
+    assert importer.dfx.to_dict("list") == {"name": ["Anna", "Bob"]}
+
+
+def test_rows_filtered_chunk_by_chunk(tmp_path):
+    lines = "".join(f"{i},{i % 7}\n" for i in range(1000))
+    filename = write(tmp_path / "numbers.csv", "id,rest\n" + lines)
+    importer = CsvXmlImporter()
+    importer.select(["id"], "rest == 0")
+    importer.update_files(filename)
+    assert importer.dfx["id"].tolist() == [*range(0, 1000, 7)]
+    chunks = [*importer.iter_chunks(chunksize=100)]
+    assert [*chunks[0].columns] == ["id"]
+    assert sum(len(chunk) for chunk in chunks) == len(importer.dfx)
+
+
+def test_xml_records_filtered_on_a_field_that_is_not_selected(tmp_path):
+    filename = write(tmp_path / "people.xml", """<root>
+        <person id="1"><name>Anna</name><age>35</age></person>
+        <person id="2"><name>Bob</name><age>25</age></person>
+    </root>""")
+    importer = CsvXmlImporter()
+    importer.set_xmlrecords("person", {"id": "@id", "name": "name", "age": "age"})
+    importer.select(["name"], "age > 30")
+    importer.update_files(filename)
+    assert importer.dfx.to_dict("list") == {"name": ["Anna"]}
+    assert [chunk.to_dict("list") for chunk in importer.iter_chunks()] == [{"name": ["Anna"]}]
+
+
+def test_watched_file_filtered_on_a_column_that_is_not_selected(tmp_path, people):
+    importer = CsvXmlImporter()
+    importer.select(["name"], "age > 30")
+    importer.poll_files(str(tmp_path))
+    write(people, open(people, encoding="utf-8").read() + "4,Dora,50,Bonn\n5,Emil,20,Bonn\n")
+    delta, _ = importer.poll_files(str(tmp_path))
+    assert delta.to_dict("list") == {"name": ["Dora"]}
+    assert importer.dfx["name"].tolist() == ["Anna", "Carl", "Dora"]
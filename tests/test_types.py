@@ -0,0 +1,110 @@
+"""tests of converting columns to the detected types and compacting them"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from csvxmlimporter import CsvXmlImporter, compact_frame, infer_types, merge_frames
+
+
+def text(*values):
+    return pd.Series(values, dtype=object)
+
+
+def test_comma_decimals_become_floats():
+    frame = infer_types(pd.DataFrame({"price": text("1,5", "2,25", "3"), "plain": text("1.5", ".5", "2")}))
+    assert frame["price"].dtype == np.float64
+    assert frame["price"].tolist() == [1.5, 2.25, 3.0]
+    assert frame["plain"].tolist() == [1.5, 0.5, 2.0]
+
+
+def test_whole_numbers_with_missing_values_become_nullable():
+    frame = infer_types(pd.DataFrame({"full": text("1", "2", "3"), "gaps": text("1", None, "3")}))
+    assert frame["full"].dtype == np.int64
+    assert frame["gaps"].dtype == "Int64"
+    assert frame["gaps"].tolist()[::2] == [1, 3] and pd.isna(frame["gaps"].iloc[1])
+
+
+def test_german_and_english_booleans():
+    frame = infer_types(pd.DataFrame({
+        "full": text("WAHR", "falsch", "ja", "Nein", "true"),
+        "gaps": text("ja", None, "NEIN", "wahr", "False"),
+    }))
+    assert frame["full"].dtype == bool
+    assert frame["full"].tolist() == [True, False, True, False, True]
+    assert frame["gaps"].dtype == "boolean"
+    assert frame["gaps"].tolist()[::2] == [True, False, False]
+
+
+def test_conversion_is_rejected_if_values_outside_the_sample_fail():
+    values = text(*[str(i) for i in range(199)], "oops")
+    frame = infer_types(pd.DataFrame({"mostly": values}), sample=20)
+    # the sample may only hold numbers, but converting would lose "oops"
+    assert frame["mostly"].tolist() == values.tolist()
+    assert frame["mostly"].dtype != np.int64
+
+
+def test_dates_times_and_categories():
+    frame = infer_types(pd.DataFrame({"date": text("01.02.2020", "31.12.2021"), "time": text("12:30:00", "08:00:15")}))
+    assert frame["date"].tolist() == [pd.Timestamp(2020, 2, 1), pd.Timestamp(2021, 12, 31)]
+    assert frame["time"].tolist() == [pd.Timedelta(hours=12, minutes=30), pd.Timedelta(hours=8, seconds=15)]
+    frame = infer_types(pd.DataFrame({"city": text(*["Berlin", "Bonn"] * 5), "name": text(*map(str, "abcdefghij"))}))
+    assert isinstance(frame["city"].dtype, pd.CategoricalDtype)
+    assert not isinstance(frame["name"].dtype, pd.CategoricalDtype)
+
+
+def test_importer_infers_the_types_of_every_file(tmp_path):
+    first = tmp_path / "a.csv"
+    first.write_text("id;price;paid\n1;1,5;ja\n2;2,5;nein\n", encoding="utf-8")
+    second = tmp_path / "b.csv"
+    second.write_text("id;price;paid\n3;4;WAHR\n", encoding="utf-8")
+    importer = CsvXmlImporter([str(first), str(second)], infertypes=True)
+    assert importer.dfx["price"].tolist() == [1.5, 2.5, 4.0]
+    assert importer.dfx["paid"].tolist() == [True, False, True]
+
+
+def test_integers_are_downcast():
+    frame = compact_frame(pd.DataFrame({"small": [1, -2, 3], "large": [0, 70000, 1], "gaps": [1.0, np.nan, 3.0]}))
+    assert frame["small"].dtype == np.int8
+    assert frame["large"].dtype == np.int32
+    assert frame["gaps"].dtype == "Int8"
+    assert pd.isna(frame["gaps"].iloc[1])
+
+
+def test_float32_only_when_lossless():
+    frame = compact_frame(pd.DataFrame({"halves": [0.5, 1.25, np.nan], "precise": [0.1, 1 / 3, 2.0]}))
+    assert frame["halves"].dtype == np.float32
+    assert frame["precise"].dtype == np.float64
+    assert frame["precise"].tolist() == [0.1, 1 / 3, 2.0]
+
+
+def test_text_becomes_categories_or_booleans():
+    frame = compact_frame(pd.DataFrame({
+        "city": text(*["Berlin", "Bonn"] * 3), "name": text(*"abcdef"),
+        "flag": text(True, False, None, True, True, False),
+    }))
+    assert isinstance(frame["city"].dtype, pd.CategoricalDtype)
+    assert not isinstance(frame["name"].dtype, pd.CategoricalDtype)
+    assert frame["flag"].dtype == "boolean"
+
+
+def test_category_union_across_files():
+    first = compact_frame(pd.DataFrame({"city": text("Berlin", "Bonn", "Berlin", "Bonn")}))
+    second = compact_frame(pd.DataFrame({"city": text("Köln", "Bonn", "Köln", "Köln")}))
+    merged = merge_frames([first, second])
+    assert isinstance(merged["city"].dtype, pd.CategoricalDtype)
+    assert [*merged["city"].cat.categories] == ["Berlin", "Bonn", "Köln"]
+    assert merged["city"].tolist() == ["Berlin", "Bonn", "Berlin", "Bonn", "Köln", "Bonn", "Köln", "Köln"]
+
+
+def test_compacted_import_keeps_every_value(tmp_path):
+    first = tmp_path / "a.csv"
+    first.write_text("id,v,city\n" + "".join(f"{i},{i / 2 if i % 5 else ''},Bonn\n" for i in range(200)),
+                     encoding="utf-8")
+    second = tmp_path / "b.csv"
+    second.write_text("id,v,city\n" + "".join(f"{i},{i},Köln\n" for i in range(400, 600)), encoding="utf-8")
+    files = [str(first), str(second)]
+    compacted = CsvXmlImporter(files, compact=True)
+    plain = CsvXmlImporter(files)
+    pd.testing.assert_frame_equal(compacted.dfx.astype(object), plain.dfx.astype(object), check_dtype=False)
+    report = compacted.memory_report()
+    assert report.loc["total", "after"] < report.loc["total", "before"]
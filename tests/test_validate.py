@@ -0,0 +1,95 @@
+"""tests of checking columns against the types patterns"""
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from csvxmlimporter import CsvXmlImporter, validate_frame
+
+
+@pytest.fixture
+def frame():
+    return pd.DataFrame({
+        "email": ["a@b.de", "not an email", None, "x@y.com", "@", "c@d.org", "e@f.net", "g@h.io", "i@j.eu", "k"],
+        "code": ["AB1", "AB22", "ab3", "CD4", None, "XY", "ZZ9", "AA10", "BB11", "C1"],
+    })
+
+
+def test_bool_dtype_only_satisfies_bool():
+    flags = pd.DataFrame({"flag": [True, False, True]})
+    counts, _ = validate_frame(flags, {"flag": "Bool"})
+    assert counts["flag"] == 0
+    # bool is a numeric dtype for pandas, but True is no number of the types patterns
+    for kind in ("Int", "Float"):
+        counts, _ = validate_frame(flags, {"flag": kind})
+        assert counts["flag"] == 3, kind
+
+
+def test_converted_dtypes_pass_without_matching():
+    converted = pd.DataFrame({
+        "int": [1, 2], "float": [1.5, 2.0], "date": pd.to_datetime(["2020-01-01", "2020-01-02"]),
+        "time": pd.to_timedelta(["01:00:00", "02:00:00"]),
+    })
+    counts, _ = validate_frame(converted, {"int": "Int", "float": "Float", "date": "Date", "time": "Time"})
+    assert counts.tolist() == [0, 0, 0, 0]
+    # an int column is a float column as well but not the other way round
+    counts, _ = validate_frame(converted, {"int": "Float"})
+    assert counts["int"] == 0
+
+
+def test_int_on_float_column_with_missing_values():
+    numbers = pd.DataFrame({"n": [1.0, np.nan, 2.5, 3.0]})
+    counts, mask = validate_frame(numbers, {"n": "Int"})
+    assert counts["n"] == 1
+    assert mask["n"].tolist() == [False, False, True, False]
+    counts, mask = validate_frame(numbers, {"n": "Int"}, allowmissing=False)
+    assert mask["n"].tolist() == [False, True, True, False]
+
+
+def test_missing_values_are_only_violations_if_not_allowed(frame):
+    counts, mask = validate_frame(frame, {"email": "Email"})
+    assert mask["email"].tolist() == [False, True, False, False, True, False, False, False, False, True]
+    counts, mask = validate_frame(frame, {"email": "Email"}, allowmissing=False)
+    assert counts["email"] == 4 and mask["email"].iloc[2]
+
+
+@pytest.mark.parametrize("chunksize", [1, 3, 4, 10, 100])
+def test_chunk_boundaries(frame, chunksize):
+    expected, expectedmask = validate_frame(frame, {"email": "Email", "code": r"[A-Z]{2}\d+"}, chunksize=100000)
+    counts, mask = validate_frame(frame, {"email": "Email", "code": r"[A-Z]{2}\d+"}, chunksize=chunksize)
+    pd.testing.assert_series_equal(counts, expected)
+    pd.testing.assert_frame_equal(mask, expectedmask)
+
+
+def test_custom_regex_has_to_match_completely(frame):
+    counts, mask = validate_frame(frame, {"code": r"[A-Z]{2}\d+"})
+    assert mask["code"].tolist() == [False, False, True, False, False, True, False, False, False, True]
+    assert counts["code"] == 3
+
+
+@pytest.mark.parametrize("executor", [ThreadPoolExecutor, ProcessPoolExecutor])
+def test_executor_gives_the_same_result(frame, executor):
+    schema = {"email": "Email", "code": r"[A-Z]{2}\d+"}
+    expected, expectedmask = validate_frame(frame, schema, chunksize=3)
+    with executor(2) as pool:
+        counts, mask = validate_frame(frame, schema, chunksize=3, executor=pool)
+    pd.testing.assert_series_equal(counts, expected)
+    pd.testing.assert_frame_equal(mask, expectedmask)
+
+
+def test_mask_keeps_the_index_and_absent_columns_fail(frame):
+    shifted = frame.set_axis(range(100, 110))
+    _, mask = validate_frame(shifted, {"email": "Email"})
+    assert mask.index.equals(shifted.index)
+    assert shifted[mask.any(axis=1)].index.tolist() == [101, 104, 109]
+    with pytest.raises(ValueError, match="missing"):
+        validate_frame(frame, {"missing": "Int"})
+
+
+def test_importer_validates_dfx(tmp_path):
+    filename = tmp_path / "people.csv"
+    filename.write_text("id,email\n1,a@b.de\n2,broken\n", encoding="utf-8")
+    importer = CsvXmlImporter([str(filename)], workers=2)
+    counts, mask = importer.validate({"id": "Int", "email": "Email"})
+    assert counts.to_dict() == {"id": 0, "email": 1}
@@ -0,0 +1,86 @@
+"""tests of reading xml files through an xsl stylesheet and of the xml caches of the importer"""
+import gc
+
+import pytest
+
+import csvxmlimporter
+from csvxmlimporter import CsvXmlImporter, LruCache, XslFileMissing
+
+XSL = """<?xml version="1.0" encoding="UTF-8"?>
+<xsl:stylesheet version="1.0" xmlns:xsl="http://www.w3.org/1999/XSL/Transform">
+    <xsl:output method="text" encoding="UTF-8"/>
+    <xsl:template match="/">
+        <xsl:text>id;name&#10;</xsl:text>
+        <xsl:for-each select="records/record">
+            <xsl:value-of select="id"/><xsl:text>;</xsl:text><xsl:value-of select="name"/>
+            <xsl:text>&#10;</xsl:text>
+        </xsl:for-each>
+    </xsl:template>
+</xsl:stylesheet>
+"""
+
+
+def write(path, text):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+    return str(path)
+
+
+def records(rows):
+    return "<records>" + "".join(f"<record><id>{i}</id><name>n{i}</name></record>" for i in range(rows)) + "</records>"
+
+
+def test_lru_cache_bounded_by_bytes():
+    cache = LruCache(10, maxbytes=100)
+    cache.put("a", 1, 60)
+    cache.put("b", 2, 30)
+    cache.put("c", 3, 30)
+    assert cache.get("a") is None and cache.get("b") == 2 and cache.nbytes == 60
+    cache.put("b", 4, 20)
+    assert cache.get("b") == 4 and cache.nbytes == 50
+    cache.put("d", 5, 101)
+    assert cache.get("d") is None and len(cache) == 2 and cache.nbytes == 50
+
+
+def make_importer(tmp_path, name, **options):
+    importer = CsvXmlImporter(**options)
+    importer.set_xslfile(write(tmp_path / "records.xsl", XSL))
+    importer.update_files(write(tmp_path / f"{name}.xml", records(5)))
+    return importer
+
+
+def caches(importer):
+    return csvxmlimporter._xmlcaches[importer._CsvXmlImporter__xmlcache[0]]
+
+
+def test_cache_sizes_are_per_importer(tmp_path):
+    large = make_importer(tmp_path, "a", xmltreecachesize=8, xmlcachesize=8)
+    small = make_importer(tmp_path, "b", xmltreecachesize=0, xmlcachesize=1)
+    assert [cache.maxsize for cache in caches(large)] == [8, 8]
+    assert [cache.maxsize for cache in caches(small)] == [0, 1]
+    assert len(caches(large)[0]) == 1 and len(caches(small)[0]) == 0
+    assert large.dfx["id"].tolist() == small.dfx["id"].tolist() == [0, 1, 2, 3, 4]
+
+
+def test_trees_over_the_byte_bound_are_not_kept(tmp_path):
+    importer = make_importer(tmp_path, "a", xmlcachebytes=100)
+    trees, texts = caches(importer)
+    assert len(trees) == 0 and len(texts) == 1
+    assert importer.dfx["name"].tolist() == [f"n{i}" for i in range(5)]
+
+
+def test_caches_are_dropped_with_the_importer(tmp_path):
+    importer = make_importer(tmp_path, "a")
+    cacheid = importer._CsvXmlImporter__xmlcache[0]
+    assert cacheid in csvxmlimporter._xmlcaches
+    del importer
+    gc.collect()
+    assert cacheid not in csvxmlimporter._xmlcaches
+
+
+def test_missing_xsl_file(tmp_path):
+    filename = write(tmp_path / "a.xml", records(2))
+    with pytest.raises(XslFileMissing, match="No .xsl file set"):
+        CsvXmlImporter([filename]).dfx
+    with pytest.raises(XslFileMissing):
+        CsvXmlImporter().update_files(filename)
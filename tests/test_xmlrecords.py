@@ -0,0 +1,82 @@
+"""tests of streaming the records of flat xml files"""
+import pandas as pd
+
+from csvxmlimporter import CsvXmlImporter, _iter_xml_records, _read_xml_records
+
+
+def write(path, text):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+    return str(path)
+
+
+def test_fields_of_attributes_children_and_xpath(tmp_path):
+    filename = write(tmp_path / "items.xml", """<root><items>
+        <item id="1"><name>Anna</name><address><city>Berlin</city></address><tag>a</tag><tag>b</tag></item>
+        <item id="2"><name>Bob</name></item>
+    </items></root>""")
+    frame = _read_xml_records(filename, "item", {"id": "@id", "name": "name", "city": "address/city",
+                                                 "tags": "count(tag)"})
+    assert frame["id"].tolist() == [1, 2]
+    assert frame["name"].tolist() == ["Anna", "Bob"]
+    assert frame["city"].iloc[0] == "Berlin" and pd.isna(frame["city"].iloc[1])
+    assert frame["tags"].tolist() == [2, 0]
+
+
+def test_tags_without_namespace_match_any_namespace(tmp_path):
+    filename = write(tmp_path / "ns.xml", """<r:root xmlns:r="urn:r" xmlns="urn:d">
+        <r:items><item><name>Anna</name></item><item><name>Bob</name></item></r:items>
+    </r:root>""")
+    assert _read_xml_records(filename, "/root/items/item", {"name": "name"})["name"].tolist() == ["Anna", "Bob"]
+    qualified = _read_xml_records(filename, "{urn:d}item", {"name": "name"})
+    assert qualified["name"].tolist() == ["Anna", "Bob"]
+    assert _read_xml_records(filename, "{urn:other}item", {"name": "name"}).empty
+
+
+def test_absolute_and_relative_record_paths(tmp_path):
+    filename = write(tmp_path / "paths.xml", """<root>
+        <items><item><id>1</id></item><item><id>2</id></item></items>
+        <archive><items><item><id>3</id></item></items></archive>
+        <other><item><id>4</id></item></other>
+    </root>""")
+    assert _read_xml_records(filename, "/root/items/item", {"id": "id"})["id"].tolist() == [1, 2]
+    assert _read_xml_records(filename, "items/item", {"id": "id"})["id"].tolist() == [1, 2, 3]
+    assert _read_xml_records(filename, "item", {"id": "id"})["id"].tolist() == [1, 2, 3, 4]
+    assert _read_xml_records(filename, "/items/item", {"id": "id"}).empty
+
+
+def test_nested_elements_with_the_record_tag(tmp_path):
+    filename = write(tmp_path / "nested.xml", """<root><items>
+        <item><id>1</id><parts><item><name>P1</name></item><item><name>P2</name></item></parts></item>
+        <item><id>2</id><parts><item><name>P3</name></item></parts></item>
+    </items></root>""")
+    fields = {"id": "id", "inner": "parts/item/name", "parts": "count(parts/item)"}
+    for record in ("/root/items/item", "items/item", "item"):
+        frame = _read_xml_records(filename, record, fields)
+        assert frame["id"].tolist() == [1, 2], record
+        assert frame["inner"].tolist() == ["P1", "P3"], record
+        assert frame["parts"].tolist() == [2, 1], record
+
+
+def test_batches_and_pruning(tmp_path):
+    # other elements between the records are pruned as well and must not disturb later records
+    records = "".join(f"<note>n{i}</note><item><id>{i}</id></item>" for i in range(25))
+    filename = write(tmp_path / "many.xml", f"<root><items>{records}</items></root>")
+    batches = [*_iter_xml_records(filename, "/root/items/item", {"id": "id"}, batchsize=10)]
+    assert [len(batch) for batch in batches] == [10, 10, 5]
+    assert pd.concat(batches)["id"].tolist() == [*range(25)]
+
+
+def test_file_without_records_gives_the_columns(tmp_path):
+    filename = write(tmp_path / "empty.xml", "<root><items/></root>")
+    frame = _read_xml_records(filename, "item", {"id": "id", "name": "name"})
+    assert frame.empty and frame.columns.tolist() == ["id", "name"]
+
+
+def test_importer_merges_records_with_csv(tmp_path):
+    xml = write(tmp_path / "a.xml", "<root><item><id>1</id><v>10</v></item><item><id>2</id><v>20</v></item></root>")
+    csv = write(tmp_path / "b.csv", "id,v\n3,30\n")
+    importer = CsvXmlImporter()
+    importer.set_xmlrecords("item", {"id": "id", "v": "v"})
+    importer.update_files(xml, csv)
+    assert importer.dfx.to_dict("list") == {"id": [1, 2, 3], "v": [10, 20, 30]}